@@ -0,0 +1,128 @@
+"""Synthetic C++ header trees for benchmarking.
+
+Generates a tree of headers plus an `all.hpp` that includes them, sized to
+roughly a requested number of symbols:
+
+    python benchmarks/corpus.py out/corpus --symbols 10000 --template-density 0.3
+"""
+from dataclasses import dataclass
+import argparse
+import os
+import random
+
+PARAM_TYPES = ['int', 'double', 'const char*', 'long', 'float', 'unsigned']
+
+@dataclass
+class CorpusSpec:
+    symbols: int = 1000 # Approximate number of symbols to generate
+    namespace_depth: int = 2
+    namespaces_per_level: int = 2
+    members: int = 4 # Member function names per class
+    overloads: int = 2 # Overloads per member function name
+    fields: int = 2 # Data members per class
+    template_density: float = 0.25 # Fraction of classes that are templates
+    comment_density: float = 0.5 # Fraction of symbols with a Doxygen comment
+    classes_per_header: int = 50
+    seed: int = 0
+
+    @property
+    def symbols_per_class(self) -> int:
+        return 1 + self.members * self.overloads + self.fields
+
+    @property
+    def class_count(self) -> int:
+        return max(1, -(-self.symbols // self.symbols_per_class))
+
+def leaf_namespaces(spec: CorpusSpec) -> list[list[str]]:
+    paths: list[list[str]] = [[]]
+    for level in range(spec.namespace_depth):
+        paths = [p + [f'ns{level}_{i}'] for p in paths for i in range(spec.namespaces_per_level)]
+    return paths
+
+def _comment(rng: random.Random, spec: CorpusSpec, indent: str, brief: str, params: list[str] = [], returns: bool = False) -> list[str]:
+    if rng.random() >= spec.comment_density:
+        return []
+    lines = [f'{indent}/**', f'{indent} * @brief {brief}', f'{indent} *',
+             f'{indent} * Longer description of {brief.lower().rstrip(".")}, spanning a couple of',
+             f'{indent} * lines like real documentation does.']
+    lines += [f'{indent} * @param {p} Value of {p}' for p in params]
+    if returns:
+        lines.append(f'{indent} * @return The result')
+    lines.append(f'{indent} */')
+    return lines
+
+def _class(rng: random.Random, spec: CorpusSpec, index: int, previous: str|None) -> tuple[list[str], bool]:
+    name = f'class{index}'
+    is_template = rng.random() < spec.template_density
+    value_type = 'T' if is_template else 'int'
+    lines = _comment(rng, spec, '', f'Synthetic class {name}.')
+    if is_template:
+        lines.append('template <typename T>')
+    lines += [f'class {name} {{', 'public:']
+    # Return a pointer to the previous class so signatures contain symbol links
+    result = f'{previous}*' if previous else value_type
+    for m in range(spec.members):
+        for o in range(spec.overloads):
+            params = [f'a{p}' for p in range(o + 1)]
+            args = ', '.join(f'{PARAM_TYPES[(m + p) % len(PARAM_TYPES)]} {a}' for p, a in enumerate(params))
+            lines += _comment(rng, spec, '    ', f'Member function m{m}, overload {o}.', params, returns=True)
+            lines.append(f'    {result} m{m}({args}) const;')
+    for f in range(spec.fields):
+        lines += _comment(rng, spec, '    ', f'Data member f{f}.')
+        lines.append(f'    {value_type} f{f};')
+    lines += ['};', '']
+    return lines, is_template
+
+def generate(spec: CorpusSpec, out_dir: str) -> list[str]:
+    """Writes the headers into `out_dir/include` and returns their paths relative to `out_dir`."""
+    rng = random.Random(spec.seed)
+    namespaces = leaf_namespaces(spec)
+    os.makedirs(os.path.join(out_dir, 'include'), exist_ok=True)
+
+    headers: list[str] = []
+    for first in range(0, spec.class_count, spec.classes_per_header):
+        header = f'include/h{len(headers)}.hpp'
+        ns = namespaces[len(headers) % len(namespaces)]
+        lines = ['#pragma once', '']
+        lines += [f'namespace {n} {{' for n in ns] + ['']
+        previous = None
+        for index in range(first, min(first + spec.classes_per_header, spec.class_count)):
+            class_lines, is_template = _class(rng, spec, index, previous)
+            lines += class_lines
+            previous = None if is_template else f'class{index}'
+        lines += ['}' * len(ns), '']
+        with open(os.path.join(out_dir, header), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        headers.append(header)
+
+    with open(os.path.join(out_dir, 'all.hpp'), 'w', encoding='utf-8') as f:
+        f.write('#pragma once\n\n' + ''.join(f'#include "{h}"\n' for h in headers))
+    return headers
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = CorpusSpec()
+    parser.add_argument('--namespace-depth', type=int, default=defaults.namespace_depth)
+    parser.add_argument('--namespaces-per-level', type=int, default=defaults.namespaces_per_level)
+    parser.add_argument('--members', type=int, default=defaults.members)
+    parser.add_argument('--overloads', type=int, default=defaults.overloads)
+    parser.add_argument('--fields', type=int, default=defaults.fields)
+    parser.add_argument('--template-density', type=float, default=defaults.template_density)
+    parser.add_argument('--comment-density', type=float, default=defaults.comment_density)
+    parser.add_argument('--classes-per-header', type=int, default=defaults.classes_per_header)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+def spec_from_args(args: argparse.Namespace, symbols: int) -> CorpusSpec:
+    return CorpusSpec(symbols=symbols, namespace_depth=args.namespace_depth, namespaces_per_level=args.namespaces_per_level,
+                      members=args.members, overloads=args.overloads, fields=args.fields,
+                      template_density=args.template_density, comment_density=args.comment_density,
+                      classes_per_header=args.classes_per_header, seed=args.seed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic C++ header tree')
+    parser.add_argument('out_dir')
+    parser.add_argument('--symbols', type=int, default=CorpusSpec.symbols)
+    add_arguments(parser)
+    args = parser.parse_args()
+    spec = spec_from_args(args, args.symbols)
+    headers = generate(spec, args.out_dir)
+    print(f'{len(headers)} headers, {spec.class_count} classes, ~{spec.class_count * spec.symbols_per_class} symbols')
@@ -0,0 +1,123 @@
+"""Scaling benchmark: build the docs of synthetic corpora of growing size.
+
+Each size gets a generated header tree (see `corpus.py`) and a minimal MkDocs
+site, built in a fresh process so peak memory is measured per size. Results
+are written as JSON Lines and, if matplotlib is installed, plotted as time and
+memory against symbol count:
+
+    python benchmarks/scaling.py --sizes 1000 10000 100000 --out bench_out
+
+Requires the plugin to be installed (MkDocs loads it through its entry point).
+"""
+from time import perf_counter
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CorpusSpec, generate, add_arguments, spec_from_args
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+def write_site(site_dir: str, direct_render: bool) -> str:
+    os.makedirs(os.path.join(site_dir, 'docs'), exist_ok=True)
+    with open(os.path.join(site_dir, 'docs', 'index.md'), 'w', encoding='utf-8') as f:
+        f.write('# Benchmark\n')
+    config_file = os.path.join(site_dir, 'mkdocs.yml')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(f'''site_name: CxxDox Benchmark
+plugins:
+  - cxxdox:
+      path_prefix: api/
+      root: {os.path.join(site_dir, 'corpus')}
+      timing_report: true
+      direct_render: {str(direct_render).lower()}
+      parse_stats: {os.path.join(site_dir, 'parse_stats.json')}
+      input:
+        - include:
+          - all.hpp
+          compile_options:
+            - -std=c++20
+markdown_extensions:
+  - toc:
+      permalink: true
+nav:
+  - Home: index.md
+  - Reference:
+    - api/index.md
+''')
+    return config_file
+
+def run_build(config_file: str) -> dict:
+    """Runs in a fresh process: builds the site and returns phase times and peak memory."""
+    from mkdocs.config import load_config
+    from mkdocs.commands.build import build
+    from cxxdox_plugin.timing import timings, peak_rss
+
+    logging.getLogger('mkdocs').setLevel(logging.ERROR)
+    site_dir = os.path.dirname(config_file)
+    config = load_config(config_file, site_dir=os.path.join(site_dir, 'site'))
+    start = perf_counter()
+    build(config)
+    total = perf_counter() - start
+
+    with open(os.path.join(site_dir, 'parse_stats.json'), encoding='utf-8') as f:
+        symbols = sum(stats['symbols_added'] for stats in json.load(f))
+    return {'symbols': symbols, 'total': total, 'peak_rss': peak_rss(),
+            'phases': {name: phase.total for name, phase in timings.phases.items()}}
+
+def plot(results: list[dict], path: str) -> None:
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print('matplotlib is not installed, skipping the plot')
+        return
+    symbols = [r['symbols'] for r in results]
+    fig, (time_ax, mem_ax) = plt.subplots(1, 2, figsize=(13, 5))
+    time_ax.plot(symbols, [r['total'] for r in results], 'o-', label='total')
+    for phase in sorted({p for r in results for p in r['phases']}):
+        time_ax.plot(symbols, [r['phases'].get(phase, 0.0) for r in results], '.--', label=phase)
+    time_ax.set(xscale='log', yscale='log', xlabel='symbols', ylabel='seconds', title='Build time')
+    time_ax.legend(fontsize='small')
+    if all(r['peak_rss'] is not None for r in results):
+        mem_ax.plot(symbols, [r['peak_rss'] / 2**20 for r in results], 'o-')
+    mem_ax.set(xscale='log', yscale='log', xlabel='symbols', ylabel='MiB', title='Peak RSS')
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f'Plot written to {path}')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure build time and memory against corpus size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Approximate symbol counts')
+    parser.add_argument('--out', default='bench_out', help='Directory for corpora, sites and results')
+    parser.add_argument('--direct-render', action='store_true')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results: list[dict] = []
+    spawn = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        spec: CorpusSpec = spec_from_args(args, size)
+        site_dir = os.path.abspath(os.path.join(args.out, f'n{size}'))
+        generate(spec, os.path.join(site_dir, 'corpus'))
+        config_file = write_site(site_dir, args.direct_render)
+        with spawn.Pool(1) as pool:
+            result = pool.apply(run_build, (config_file,))
+        result['requested'] = size
+        results.append(result)
+        rss = f"{result['peak_rss'] / 2**20:.0f} MiB" if result['peak_rss'] is not None else 'n/a'
+        print(f"{result['symbols']:>9} symbols  {result['total']:9.2f} s  {rss:>9}")
+
+    with open(os.path.join(args.out, 'results.jsonl'), 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+    plot(results, os.path.join(args.out, 'scaling.png'))
+
+if __name__ == '__main__':
+    main()
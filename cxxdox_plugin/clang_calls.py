@@ -0,0 +1,96 @@
+from time import perf_counter
+from typing import Any, Callable
+import os
+import sys
+import threading
+from .libclang21 import cindex
+from .libclang21.cindex import conf, FUNCTION_LIST
+
+TOP_ITEMS = 15
+
+class _CountingLibrary:
+    """Stands in for the loaded libclang `CDLL`, wrapping each registered function on first access."""
+
+    def __init__(self, lib: Any, counter: 'LibclangCallCounter'):
+        self._lib = lib
+        self._counter = counter
+
+    def __getattr__(self, name: str) -> Any:
+        func = getattr(self._lib, name)
+        if name in self._counter.function_names:
+            func = self._counter.wrap(name, func)
+        setattr(self, name, func)
+        return func
+
+class LibclangCallCounter:
+    """Calls and total time per libclang function, and the Python code driving them.
+
+    `install` swaps `conf.lib`, through which the bundled cindex bindings make
+    every call, for a counting proxy; `uninstall` puts the library back. A
+    call's caller is the first frame outside cindex.py and this module. Times
+    of functions that call back into Python (clang_visitChildren) include the
+    callbacks. Calls made on several threads are counted under a lock.
+    """
+    function_names: set[str]
+    calls: dict[str, int]
+    totals: dict[str, float]
+    callers: dict[tuple[str, str], int]
+    lock: threading.Lock
+
+    def __init__(self):
+        self.function_names = {item[0] for item in FUNCTION_LIST}
+        self.calls = {}
+        self.totals = {}
+        self.callers = {}
+        self.lock = threading.Lock()
+
+    def install(self) -> None:
+        lib = conf.lib # Loads libclang and registers the function table
+        if not isinstance(lib, _CountingLibrary):
+            conf.lib = _CountingLibrary(lib, self) # type: ignore[misc]
+
+    def uninstall(self) -> None:
+        lib = conf.__dict__.get('lib')
+        if isinstance(lib, _CountingLibrary):
+            conf.lib = lib._lib # type: ignore[misc]
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        skipped_files = {cindex.__file__, __file__} # Nested calls come from errcheck handlers
+        calls = self.calls
+        totals = self.totals
+        callers = self.callers
+        lock = self.lock
+
+        def counted(*args):
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = perf_counter() - start
+                frame = sys._getframe(1)
+                while frame.f_back is not None and frame.f_code.co_filename in skipped_files:
+                    frame = frame.f_back
+                caller = f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}'
+                with lock:
+                    totals[name] = totals.get(name, 0.0) + elapsed
+                    calls[name] = calls.get(name, 0) + 1
+                    callers[(caller, name)] = callers.get((caller, name), 0) + 1
+        return counted
+
+    def report(self) -> str:
+        width = max([len(name) for name in self.calls] + [8])
+        lines = [f"{'Function':<{width}}  {'Calls':>9}  {'Total, s':>9}  {'Mean, us':>9}",
+                 '-' * (width + 33)]
+        for name in sorted(self.calls, key=lambda name: -self.totals[name]):
+            calls = self.calls[name]
+            lines.append(f'{name:<{width}}  {calls:>9}  {self.totals[name]:>9.3f}  {self.totals[name] * 1e6 / calls:>9.2f}')
+
+        per_caller: dict[str, int] = {}
+        for (caller, name), calls in self.callers.items():
+            per_caller[caller] = per_caller.get(caller, 0) + calls
+        lines.append('Top callers:')
+        for caller in sorted(per_caller, key=lambda caller: -per_caller[caller])[:TOP_ITEMS]:
+            functions = sorted(((calls, name) for (c, name), calls in self.callers.items() if c == caller), reverse=True)
+            lines.append(f'  {per_caller[caller]:>9}  {caller}')
+            lines.append('             ' + ', '.join(f'{name} ({calls})' for calls, name in functions[:4]))
+        return '\n'.join(lines)
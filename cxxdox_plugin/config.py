@@ -1,5 +1,5 @@
 
-from mkdocs.config.config_options import Type, Optional, ListOfItems, SubConfig, Dir
+from mkdocs.config.config_options import Type, Optional, ListOfItems, SubConfig, Dir, File
 from mkdocs.config.base import Config
 
 class InputDict(Config):
@@ -8,6 +8,7 @@ class InputDict(Config):
     exclude_symbols = ListOfItems(Type(str), default=[])
     compile_options = ListOfItems(Type(str), default=[])
     hide_tokens = ListOfItems(Type(str), default=[])
+    umbrella = Type(bool, default=False)
 
 class CxxDoxConfig(Config):
     title = Type(str, default="CxxDox Documentation")
@@ -15,3 +16,15 @@ class CxxDoxConfig(Config):
     path_prefix = Type(str, default="cxxdox/")
     symbol_prefixes = ListOfItems(Type(str), default=[])
     root = Dir(default=".")
+    direct_render = Type(bool, default=False)
+    dump_index = Optional(File(exists=False))
+    timing_report = Type(bool, default=False)
+    parse_stats = Optional(File(exists=False))
+    include_graph = Optional(File(exists=False))
+    incremental = Type(bool, default=False)
+    parse_threads = Type(int, default=1)
+    trace_events = Optional(File(exists=False))
+    profile = Optional(Dir(exists=False))
+    memory_report = Type(bool, default=False)
+    memory_trace = Type(bool, default=False)
+    libclang_stats = Type(bool, default=False)
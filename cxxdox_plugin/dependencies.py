@@ -0,0 +1,77 @@
+from dataclasses import dataclass, field, asdict
+import json
+import os
+
+def file_mtime(file_name: str) -> int|None:
+    try:
+        return os.stat(file_name).st_mtime_ns
+    except OSError:
+        return None
+
+@dataclass
+class UnitDependencies:
+    """Files one translation unit was built from, as reported by `TranslationUnit.get_includes`."""
+    includes: dict[str, list[str]] = field(default_factory=dict) # File -> files it #includes directly
+    mtimes: dict[str, int] = field(default_factory=dict) # Every file of the TU -> modification time when parsed
+
+class IncludeGraph:
+    """Include graph of every input translation unit.
+
+    Written as JSON (`{"units": {tu: {"includes": ..., "mtimes": ...}}}`) for
+    inspection. Incremental rebuilds check the graph of the units kept in
+    memory, the file is not read back.
+    """
+    units: dict[str, UnitDependencies]
+
+    def __init__(self, units: dict[str, UnitDependencies]|None = None):
+        self.units = units if units is not None else {}
+
+    def record(self, unit: str, inclusions: list[tuple[str, str]]) -> UnitDependencies:
+        """Records a TU from its (including file, included file) pairs. Files not on disk get no mtime."""
+        deps = UnitDependencies()
+        for file_name in [unit] + [name for inclusion in inclusions for name in inclusion]:
+            if file_name not in deps.mtimes and (mtime := file_mtime(file_name)) is not None:
+                deps.mtimes[file_name] = mtime
+        for source, include in inclusions:
+            deps.includes.setdefault(source, []).append(include)
+        self.units[unit] = deps
+        return deps
+
+    def changed_files(self) -> set[str]:
+        """Files modified or removed since they were recorded, each checked once."""
+        checked: dict[str, int|None] = {}
+        changed: set[str] = set()
+        for deps in self.units.values():
+            for file_name, mtime in deps.mtimes.items():
+                if file_name not in checked:
+                    checked[file_name] = file_mtime(file_name)
+                if checked[file_name] != mtime:
+                    changed.add(file_name)
+        return changed
+
+    def invalidated(self, changed_files: set[str]) -> set[str]:
+        """Units that are, or transitively include, one of `changed_files`."""
+        result: set[str] = set()
+        for unit, deps in self.units.items():
+            if unit not in changed_files and changed_files.isdisjoint(deps.includes.keys() | deps.mtimes.keys()):
+                continue
+            included_by: dict[str, list[str]] = {}
+            for source, includes in deps.includes.items():
+                for include in includes:
+                    included_by.setdefault(include, []).append(source)
+            seen = set(changed_files)
+            stack = list(changed_files)
+            while stack:
+                current = stack.pop()
+                if current == unit:
+                    result.add(unit)
+                    break
+                for source in included_by.get(current, []):
+                    if source not in seen:
+                        seen.add(source)
+                        stack.append(source)
+        return result
+
+    def write(self, file_name: str) -> None:
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump({'units': {unit: asdict(deps) for unit, deps in self.units.items()}}, f, indent='\t')
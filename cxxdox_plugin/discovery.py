@@ -0,0 +1,120 @@
+from os import path
+import os
+import re
+
+_magic = re.compile(r'[*?[]')
+
+def translate_glob(pattern: str) -> str:
+    """Regex source for a `glob.glob(recursive=True)` pattern over '/'-separated paths.
+
+    `*`, `?` and `[...]` don't match '/', a `**` component matches any number
+    of directories, and names starting with '.' only match components that
+    start with '.' themselves, as in `glob`.
+    """
+    parts = []
+    components = pattern.split('/')
+    for i, component in enumerate(components):
+        last = i == len(components) - 1
+        if component == '**':
+            parts.append(r'(?:[^/.][^/]*/)*' if not last else r'(?:[^/.][^/]*/)*[^/.][^/]*')
+            continue
+        regex = '' if component.startswith('.') or not _magic.search(component) else r'(?!\.)'
+        j, n = 0, len(component)
+        while j < n:
+            c = component[j]
+            j += 1
+            if c == '*':
+                regex += '[^/]*'
+            elif c == '?':
+                regex += '[^/]'
+            elif c == '[':
+                # As in fnmatch: a ']' right after '[' or '[!' is part of the set
+                k = j + 1 if component[j:j + 1] == '!' else j
+                k = k + 1 if component[k:k + 1] == ']' else k
+                end = component.find(']', k)
+                if end == -1:
+                    regex += '\\['
+                    continue
+                body = re.sub(r'([&~|[])', r'\\\1', component[j:end].replace('\\', '\\\\'))
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                elif body.startswith('^'):
+                    body = '\\' + body
+                regex += f'[{body}]'
+                j = end + 1
+            else:
+                regex += re.escape(c)
+        parts.append(regex if last else regex + '/')
+    return ''.join(parts) + r'\Z'
+
+def _split_base(pattern: str) -> tuple[str, str]:
+    # Leading components without wildcards name the directory to start walking from
+    components = pattern.split('/')
+    for i, component in enumerate(components):
+        if _magic.search(component):
+            return '/'.join(components[:i]), '/'.join(components[i:])
+    return pattern, ''
+
+def find_files(include_patterns: list[str], exclude_patterns: list[str], root_dir: str) -> list[str]:
+    """Files matching any include pattern and no exclude pattern, relative to `root_dir`, sorted.
+
+    Returns the same paths as expanding every pattern with
+    `glob.glob(path.join(root_dir, pattern), recursive=True)`, but walks each
+    directory once with `os.scandir` and never enters directories excluded
+    as a whole (an exclude pattern ending in `/**` or `/**/*`).
+    """
+    def normalize(pattern: str) -> str:
+        return path.join(root_dir, pattern).replace(os.sep, '/')
+
+    excludes = [normalize(pattern) for pattern in exclude_patterns]
+    excluded_file = re.compile('|'.join(translate_glob(pattern) for pattern in excludes)) if excludes else None
+    dir_patterns = [pattern.removesuffix('/*').removesuffix('/**') for pattern in excludes
+                    if pattern.endswith('/**') or pattern.endswith('/**/*')]
+    excluded_dir = re.compile('|'.join(translate_glob(pattern) for pattern in dir_patterns)) if dir_patterns else None
+
+    walks: dict[str, list[tuple[str, int|None]]] = {} # Base dir -> (pattern rest, depth limit) pairs
+    found: set[str] = set()
+    for pattern in include_patterns:
+        base, rest = _split_base(normalize(pattern))
+        if not rest:
+            if path.isfile(base):
+                found.add(base)
+            continue
+        depth = None if '**' in rest.split('/') else rest.count('/') + 1
+        walks.setdefault(base, []).append((rest, depth))
+
+    for base, patterns in walks.items():
+        matcher = re.compile('|'.join(translate_glob(rest) for rest, _ in patterns))
+        max_depth = None if any(depth is None for _, depth in patterns) else max(depth or 0 for _, depth in patterns)
+        prefix = base if not base or base.endswith('/') else base + '/'
+        # (directory, path relative to base, depth, real path)
+        stack: list[tuple[str, str, int, str]] = [(base or '.', '', 1, path.realpath(base or '.'))]
+        while stack:
+            dir_name, rel_dir, depth, real_dir = stack.pop()
+            try:
+                entries = list(os.scandir(dir_name))
+            except OSError:
+                continue
+            for entry in entries:
+                rel = rel_dir + entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if excluded_dir is not None and excluded_dir.match(prefix + rel):
+                        continue
+                    # Symlinks are followed, as by glob, unless they point back up the tree
+                    real = path.realpath(entry.path) if entry.is_symlink() else path.join(real_dir, entry.name)
+                    if entry.is_symlink() and (real == real_dir or real_dir.startswith(real + os.sep)):
+                        continue
+                    stack.append((entry.path, rel + '/', depth + 1, real))
+                elif matcher.match(rel):
+                    found.add(prefix + rel)
+
+    files = [file for file in found if excluded_file is None or not excluded_file.match(file)]
+    if os.sep != '/':
+        files = [file.replace('/', os.sep) for file in files]
+    return sorted(files)
@@ -0,0 +1,246 @@
+import json
+from parsimonious.grammar import Grammar
+from parsimonious.nodes import NodeVisitor
+
+from cxxdox_plugin.logs import log
+import parsimonious.exceptions
+
+# Kept apart from doxygen.py so that rendering does not import parsimonious
+# or build the grammar; only the parser needs them
+
+doxygen_grammar = Grammar(
+    r"""
+    _all                 = _newline* (_section _newline*)*
+    _section             = brief / details / param / tparam / return / retval / note / see / code /
+                           copybrief / remark / warning / copydoc / enum / class / struct / 
+                           pre / post / exception / since / version / deprecated /
+                           typedef / addtogroup / ingroup / _paragraph / anytag 
+    _ws                  = ~r"[^\S\n]"
+    _newline             = _ws* "\n" _ws*
+    _word_text           = ~r"\S+" / ~r"\".*\""
+    # REFWORD mirroring Doxygen's grammar (src/doctokenizer.l): an optional
+    # leading "::"/"#", a sequence of identifiers (with optional template
+    # arguments) separated by "::"/"#"/"."/"-"/"/", an optional function
+    # argument list "(...)" with an optional const/volatile suffix. Trailing
+    # punctuation such as ';', ',', '.' (sentence end) is NOT consumed, so it
+    # stays as plain text -- matching how Doxygen tokenizes \ref <name>.
+    _ref_word            = ~r"(?:#|::)?[A-Za-z_]\w*(?:<(?:[^<>]|<[^<>]*>)*>)?(?:(?:::|#|\.|-|/)[A-Za-z_]\w*(?:<(?:[^<>]|<[^<>]*>)*>)?)*(?:\((?:[^()]|\([^()]*\))*\)(?:[ \t]*(?:const|volatile))?)?" / ~r"\".*\""
+    _tag_start           = "@" / "\\"
+    _line_text           = ~r"[^\n]+"
+    _paragraph_text      = ~r"([^@\\\$\n]|\n(?!\n))+"
+    _paragraph           = (_paragraph_text / _inline)+
+    _opt_paragraph       = ((_ws / "\n") (_paragraph_text / _inline)*)?
+    
+    _param_dir           = "[" ~r"in|out|in[ ,]?out|out[ ,]?in" "]"
+
+    _inline              = ref / p / c / b / formula / md_formula / inline_formula1 / inline_formula2
+
+    _code_content        = ~r"(?s).*?(?=@endcode|\\endcode|$)"
+    _formula_content     = ~r"(?s).*?(?=@f\]|\\f\]|$)"s
+    _inline_formula1_content = ~r"(?s).*?(?=@f\$|\\f\$|$)"
+    _inline_formula2_content = ~r"(?s).*?(?=@\)|\\\)|$)"
+
+    # Inlines
+    b                    = _tag_start "b" _ws+ _word_text
+    p                    = _tag_start "p" _ws+ _word_text
+    c                    = _tag_start "c" _ws+ _word_text
+    ref                  = _tag_start "ref" _ws+ _ref_word
+    formula              = _tag_start "f[" _formula_content _tag_start "f]"
+    md_formula           = "$" ~r"(?s).*?(?=\$|$)" "$"
+    inline_formula1      = _tag_start "f$" _inline_formula1_content _tag_start "f$"
+    inline_formula2      = _tag_start "(" _inline_formula2_content _tag_start ")"
+
+    # Sections
+    brief                = _tag_start "brief" _opt_paragraph
+    details              = _tag_start "details" _opt_paragraph
+    param                = _tag_start "param" _param_dir? _ws* _word_text _opt_paragraph
+    tparam               = _tag_start "tparam" _ws* _word_text _opt_paragraph
+    return               = _tag_start ("returns" / "return") _opt_paragraph
+    retval               = _tag_start "retval" _ws* _word_text _opt_paragraph
+    note                 = _tag_start "note" _opt_paragraph
+    see                  = _tag_start ("sa" / "see") _opt_paragraph
+    code                 = _tag_start "code" _ws* _code_content _tag_start "endcode"
+    copybrief            = _tag_start "copybrief" _ws+ _ref_word
+    remark               = _tag_start ("remarks" / "remark") _opt_paragraph
+    warning              = _tag_start "warning" _opt_paragraph
+    copydoc              = _tag_start "copydoc" _ws+ _ref_word
+    enum                 = _tag_start "enum" _ws+ _ref_word
+    class                = _tag_start "class" _ws+ _ref_word
+    struct               = _tag_start "struct" _ws+ _ref_word
+    pre                  = _tag_start "pre" _opt_paragraph
+    post                 = _tag_start "post" _opt_paragraph
+    exception            = _tag_start ("exceptions" / "exception" / "throws" / "throw") _ws* _word_text _opt_paragraph
+    since                = _tag_start "since" _opt_paragraph
+    version              = _tag_start "version" _opt_paragraph
+    deprecated           = _tag_start "deprecated" _opt_paragraph
+    typedef              = _tag_start "typedef" _ws+ _ref_word
+    addtogroup           = _tag_start ("addtogroup" / "defgroup") _ws+ _ref_word _ws* _line_text* _opt_paragraph
+    ingroup              = _tag_start "ingroup" _ws+ _ref_word
+
+    # Fallback
+    anytag               = _tag_start ~r"\S+" _ws* _line_text*
+    """)
+
+def unwrap(list_or_str):
+    if isinstance(list_or_str, list):
+        if len(list_or_str) == 1:
+            return unwrap(list_or_str[0])
+        list_or_str = [unwrap(x) for x in list_or_str]
+        list_or_str = [x for x in list_or_str if x]  # remove empty
+        while len(list_or_str) > 1 and isinstance(list_or_str[0], str) and list_or_str[0].strip() == '':
+            list_or_str.pop(0)
+        while len(list_or_str) > 1 and isinstance(list_or_str[-1], str) and list_or_str[-1].strip() == '':
+            list_or_str.pop()
+        if len(list_or_str) > 1:
+            if isinstance(list_or_str[0], str):
+                list_or_str[0] = list_or_str[0].lstrip()
+            if isinstance(list_or_str[-1], str):
+                list_or_str[-1] = list_or_str[-1].rstrip()
+        return list_or_str
+    if hasattr(list_or_str, 'text'):
+        return list_or_str.text.strip()
+    return list_or_str
+
+class DoxygenVisitor(NodeVisitor):
+    def visit_brief(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'brief': unwrap(paragraph)}
+    def visit_details(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'details': unwrap(paragraph)}
+    def visit_param(self, node, visited_children):
+        _, _, param_dir, _, param_name, paragraph = visited_children
+        return {'param': {'name': param_name, 'dir': param_dir, 'desc': unwrap(paragraph)}}
+    def visit_copybrief(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'copybrief': symbol_name}
+    def visit_copydoc(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'copydoc': symbol_name}
+    def visit_tparam(self, node, visited_children):
+        _, _, _, param_name, paragraph = visited_children
+        return {'tparam': {'name': param_name, 'desc': unwrap(paragraph)}}
+    def visit_return(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'return': unwrap(paragraph)}
+    def visit_retval(self, node, visited_children):
+        _, _, _, retval_name, paragraph = visited_children
+        return {'retval': {'name': retval_name, 'desc': unwrap(paragraph)}}
+    def visit_since(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'since': unwrap(paragraph)}
+    def visit_version(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'version': unwrap(paragraph)}
+    def visit_deprecated(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'deprecated': unwrap(paragraph)}
+    def visit_pre(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'pre': unwrap(paragraph)}
+    def visit_post(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'post': unwrap(paragraph)}
+    def visit__word_text(self, node, visited_children):
+        return node.text.strip().strip('"')
+    def visit__ref_word(self, node, visited_children):
+        return node.text.strip().strip('"')
+    def visit_exception(self, node, visited_children):
+        _, _, _, exc_name, paragraph = visited_children
+        return {'exception': {'name': exc_name, 'desc': unwrap(paragraph)}}
+    def visit_enum(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'enum': symbol_name}
+    def visit_class(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'class': symbol_name}
+    def visit_struct(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'struct': symbol_name}
+    def visit_typedef(self, node, visited_children):
+        _, _, _, symbol_name = visited_children
+        return {'typedef': symbol_name}
+    def visit_inline_formula1(self, node, visited_children):
+        _, _, formula_content, _, _ = visited_children
+        return {'inline_formula': formula_content.strip()}
+    def visit_inline_formula2(self, node, visited_children):
+        _, _, formula_content, _, _ = visited_children
+        return {'inline_formula': formula_content.strip()}
+    def visit_formula(self, node, visited_children):
+        _, _, formula_content, _, _ = visited_children
+        return {'formula': formula_content.strip()}
+    def visit_md_formula(self, node, visited_children):
+        _, formula_content, _ = visited_children
+        return {'inline_formula': formula_content.strip()}
+    def visit_note(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'note': unwrap(paragraph)}
+    def visit_warning(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'warning': unwrap(paragraph)}
+    def visit_see(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'see': unwrap(paragraph)}
+    def visit_remark(self, node, visited_children):
+        _, _, paragraph = visited_children
+        return {'remark': unwrap(paragraph)}
+    def visit_code(self, node, visited_children):
+        _, _, _, code_content, _, _ = visited_children
+        return {'code': code_content.strip()}
+    def visit__paragraph(self, node, visited_children):
+        f = unwrap(visited_children)
+        return f
+    def visit__paragraph_text(self, node, visited_children):
+        return node
+    def visit__param_dir(self, node, visited_children):
+        return visited_children[1]
+    def visit_p(self, node, visited_children):
+        _, _, _, word = visited_children
+        return {'p': word}
+    def visit_b(self, node, visited_children):
+        _, _, _, word = visited_children
+        return {'b': word}
+    def visit_c(self, node, visited_children):
+        _, _, _, word = visited_children
+        return {'c': word}
+    def visit_ref(self, node, visited_children):
+        _, _, _, word = visited_children
+        return {'ref': word}
+    def visit__section(self, node, visited_children):
+        return unwrap(visited_children[0])
+    def visit_addtogroup(self, node, visited_children):
+        _, _, _, name, _, title, paragraph = visited_children
+        return {'addtogroup': {'name': name, 'title': title, 'desc': unwrap(paragraph)}}
+    def visit_ingroup(self, node, visited_children):
+        _, _, _, name = visited_children
+        return {'ingroup': name}
+    def visit_anytag(self, node, visited_children):
+        _, tagname, _, line_text = visited_children
+        # tagname may already be unwrapped to a str by generic_visit
+        tagname_str = tagname.text.strip() if hasattr(tagname, 'text') else str(tagname).strip()
+        log.warning(f"Unsupported Doxygen tag '@{tagname_str}' in comment: {node.text.strip()!r}")
+        return f"{node.text.strip()}"
+    def generic_visit(self, node, visited_children):
+        return unwrap(visited_children or node)
+
+def parse_doxygen_comment(comment: str) -> list:
+    try:
+        nodes = doxygen_grammar.parse(comment)
+
+        visitor = DoxygenVisitor()
+        result = visitor.visit(nodes)
+        result = unwrap(result)
+        if not isinstance(result, list):
+            result = [result]
+        return result
+    except parsimonious.exceptions.IncompleteParseError as e:
+        log.error(f"Error parsing doxygen comment: {e}")
+        return [comment]
+
+if __name__ == "__main__":
+
+    data = parse_doxygen_comment(
+r"""@brief This is a demo library to showcase documentation features.
+""")
+
+    print(json.dumps(data, indent=4))
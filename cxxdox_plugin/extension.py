@@ -9,9 +9,10 @@ from xml.etree.ElementTree import fromstring
 from mkdocs.structure.pages import Page
 from typing import Callable
 from cxxdox_plugin.doxygen import doxygen_to_html, escape
-from .highlight import cxx_tokens_to_html
 from .logs import log
-from .parser import Index, SymbolType
+from .timing import timings
+from .tracing import tracer
+from .index import Index, SymbolType
 import os
 from pathlib import Path
 
@@ -56,6 +57,15 @@ def dummy_span(classes: str, text: str) -> Element:
     span.text = text
     return span
 
+def parse_fragment(md: Markdown, html: str) -> Element:
+    """Parses generated HTML into elements, so Markdown still runs its inline patterns over the text."""
+    root_el = fromstring(html)
+    # Block formulas are final, keep backslash escapes from eating their delimiters
+    for div_el in root_el.iter('div'):
+        if div_el.get('class') == 'arithmatex' and div_el.text:
+            div_el.text = md.htmlStash.store(escape(div_el.text))
+    return root_el
+
 class SymbolLinkProcessor(InlineProcessor):
     def __init__(
         self, 
@@ -103,7 +113,7 @@ class SymbolLinkProcessor(InlineProcessor):
         if emit_brief and 'brief' in sym:
             context = full_name or ''
             brief_html = doxygen_to_html(sym.get('brief', ''), index, context, link_resolver)
-            brief_el = fromstring(f'<span class="cxx-inline-brief"> {brief_html}</span>')
+            brief_el = parse_fragment(md, f'<span class="cxx-inline-brief"> {brief_html}</span>')
             root_el.append(brief_el)
         return root_el
 
@@ -132,6 +142,10 @@ class SymbolLinkProcessor(InlineProcessor):
         return close_len == open_len
 
     def handleMatch(self, m, data):
+        with timings.measure('symbol links'):
+            return self._handle_match(m, data)
+
+    def _handle_match(self, m, data):
         # Skip `[[...]]` that is wrapped in backticks (inline code), e.g.
         # `[[...]]` or `` [[...]] ``. Let the lower-priority backtick processor
         # render it as code instead.
@@ -162,11 +176,13 @@ class CxxDoxProcessor(BlockProcessor):
         md: Markdown,
         index: Index,
         link_resolver: Callable[[str],str],
+        source_html: Callable[[str],str],
     ) -> None:
         super().__init__(parser=md.parser)
         self.md = md
         self.index = index
         self.link_resolver = link_resolver
+        self.source_html = source_html
         
     def test(self, parent: Element, block: str) -> bool:
         return bool(self.regex.search(block))
@@ -205,9 +221,9 @@ class CxxDoxProcessor(BlockProcessor):
         if has_source:
             div_highlight = Element('div', {'class': 'highlight'})
             pre_el = Element('pre')
-            src = sym.get('source', '')
-            html_source = cxx_tokens_to_html(src, self.index, {sym_id}, self.link_resolver)
-            code_el = fromstring(f'<code>{html_source}</code>')
+            code_el = Element('code')
+            # Final HTML with links to page URLs, stashed rather than parsed back into elements
+            code_el.text = self.md.htmlStash.store(self.source_html(sym_id))
             pre_el.append(Element('b', {'class': 'LAUyl5Cz5B'}))
             pre_el.append(code_el)
             div_highlight.append(pre_el)
@@ -215,10 +231,10 @@ class CxxDoxProcessor(BlockProcessor):
 
         contents_el = Element('div', {'class': 'cxx-contents'})
         brief_html = '<p>' + doxygen_to_html(sym.get('brief', ''), self.index, context, self.link_resolver) + '</p>'
-        contents_el.append(fromstring(brief_html))
+        contents_el.append(parse_fragment(self.md, brief_html))
         if 'details' in sym and sym['details']:
             details_html = '<p>' + doxygen_to_html(sym.get('details', ''), self.index, context, self.link_resolver) + '</p>'
-            contents_el.append(fromstring(details_html))
+            contents_el.append(parse_fragment(self.md, details_html))
 
         parent.append(contents_el)
         
@@ -226,7 +242,8 @@ class CxxDoxProcessor(BlockProcessor):
             children_el = Element('div', {'class': 'cxx-children'})
             contents_el.append(children_el)
             for child_id in children:
-                self._symbol_doc(children_el, child_id, min(heading_level + 1, 6), group)
+                with tracer.span('symbol doc', 'render', id=child_id):
+                    self._symbol_doc(children_el, child_id, min(heading_level + 1, 6), group)
 
         file = sym.get("file","")
         if file != '':
@@ -251,13 +268,15 @@ class CxxDoxProcessor(BlockProcessor):
             identifier = match["name"]
             heading_level = match["heading"].count("#")
 
-            sym_id = self.index.lookup_by_scoped_name('', identifier)
+            with timings.measure('cxxdox blocks', identifier):
+                sym_id = self.index.lookup_by_scoped_name('', identifier)
 
-            if sym_id is None:
-                log.warning(f"CxxDox symbol not found: {identifier}")
-                return
-            
-            self._symbol_doc(parent, sym_id, heading_level)
+                if sym_id is None:
+                    log.warning(f"CxxDox symbol not found: {identifier}")
+                    return
+                
+                with tracer.span('symbol doc', 'render', id=sym_id):
+                    self._symbol_doc(parent, sym_id, heading_level)
         
         if the_rest:
             # This block contained unindented line(s) after the first indented
@@ -273,20 +292,22 @@ class CxxDoxExtension(Extension):
             self, 
             index: Index, 
             link_resolver: Callable[[str],str],
+            source_html: Callable[[str],str],
             **kwargs: Any,
         ) -> None:
         self.index = index
         self.link_resolver = link_resolver
+        self.source_html = source_html
         super().__init__(**kwargs)
 
     def extendMarkdown(self, md: Markdown) -> None:
         md.parser.blockprocessors.register(
-            CxxDoxProcessor(md, self.index, self.link_resolver),
+            CxxDoxProcessor(md, self.index, self.link_resolver, self.source_html),
             "cxxdox_block_processor",
             priority=75,
         )
         md.parser.blockprocessors.register(
-            CxxDoxProcessor(md, self.index, self.link_resolver),
+            CxxDoxProcessor(md, self.index, self.link_resolver, self.source_html),
             "cxxdox_brief_processor",
             priority=75,
         )
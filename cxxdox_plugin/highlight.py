@@ -1,61 +1,63 @@
 from enum import Enum
 from dataclasses import dataclass
-from typing import Callable, Iterator
+from typing import Callable
+from hashlib import md5
 
 from cxxdox_plugin.index import Index, CxxToken, CxxTokenType
-from .libclang21.cindex import TokenKind, Token, CursorKind, SourceRange, Cursor, TranslationUnit, SourceLocation, AccessSpecifier, Config as ClangConfig
 from cxxdox_plugin.doxygen import escape
 
-def cursor_to_symbol_id(cursor: Cursor) -> str|None:
-    if cursor is None or cursor.is_null():
-        return None
-    if cursor.kind.is_declaration() or cursor.kind.is_reference():
-        symbol_id = cursor.get_usr()
-        if symbol_id:
-            return symbol_id
-        def_cursor = cursor.get_definition()
-        if def_cursor is not None and def_cursor != cursor:
-            return cursor_to_symbol_id(def_cursor)
-    return None
-
-def to_cxx_tokens(tokens: Iterator[Token], source: bytes, indent: int = 0) -> list[CxxToken]:
-    result: list[CxxToken] = []
-
-    last_pos = None
-    for t in tokens:
-        if last_pos is not None:
-            if t.extent.start.offset > last_pos:
-                gap = source[last_pos : t.extent.start.offset]
-                gap = gap.replace(b'\r\n', b'\n')
-                gap = gap.replace(b'\n' + indent * b' ', b'\n')
-                result.append(CxxToken(type=CxxTokenType.WHITESPACE, spelling=gap.decode('utf-8')))
-
-        ref: str|None = None
-        if t.kind == TokenKind.IDENTIFIER:
-            token_type = CxxTokenType.IDENTIFIER
-            ref = cursor_to_symbol_id(t.cursor)
-        elif t.kind == TokenKind.KEYWORD:
-            token_type = CxxTokenType.KEYWORD
-        elif t.kind == TokenKind.LITERAL:
-            token_type = CxxTokenType.LITERAL
-        elif t.kind == TokenKind.COMMENT:
-            token_type = CxxTokenType.COMMENT
-        elif t.kind == TokenKind.PUNCTUATION:
-            token_type = CxxTokenType.PUNCTUATION
-        else:
-            token_type = CxxTokenType.UNKNOWN
-
-        result.append(CxxToken(type=token_type, spelling=t.spelling, ref=ref))
-
-        last_pos = t.extent.end.offset
-    return result
-
-def cxx_tokens_to_html(tokens: list[CxxToken], index: Index, ignore: set[str], link_resolver: Callable[[str],str]) -> str:
+def source_digest(tokens: list[CxxToken]) -> str:
+    h = md5()
+    for token in tokens:
+        h.update(f'{token.type}\x00{token.spelling}\x00{token.ref or ""}\x01'.encode('utf-8'))
+    return h.hexdigest()
+
+def token_html(token: CxxToken) -> str:
+    if token.html is None:
+        token.html = f'<span class="{token.type}">{escape(token.spelling)}</span>'
+    return token.html
+
+def cxx_tokens_to_html(tokens: list[CxxToken], index: Index, ignore: set[str], link_resolver: Callable[[str],str],
+                       links: dict[str, str|None]|None = None) -> str:
     html_parts: list[str] = []
     for token in tokens:
-        if token.ref is not None and token.ref not in ignore and index.has_symbol(token.ref):
-            link = link_resolver(index.symbol_permalink(token.ref) or "")
-            html_parts.append(f'<a href="{link}"><span class="{token.type}">{escape(token.spelling)}</span></a>')
-        else:
-            html_parts.append(f'<span class="{token.type}">{escape(token.spelling)}</span>')
+        if token.ref is not None and token.ref not in ignore:
+            permalink = index.symbol_permalink(token.ref)
+            if links is not None:
+                links[token.ref] = permalink
+            if index.has_symbol(token.ref):
+                html_parts.append(f'<a href="{link_resolver(permalink or "")}">{token_html(token)}</a>')
+                continue
+        html_parts.append(token_html(token))
     return ''.join(html_parts)
+
+@dataclass
+class CachedSignature:
+    digest: str
+    links: dict[str, str|None]
+    html: str
+
+class SignatureCache:
+    """Highlighted source HTML per (symbol, page directory).
+
+    An entry is reused while the symbol's source digest and the permalinks of
+    every symbol it links to are unchanged, so the token loop only runs for
+    signatures that actually changed.
+    """
+    entries: dict[tuple[str, str], CachedSignature]
+
+    def __init__(self):
+        self.entries = {}
+
+    def render(self, index: Index, sym_id: str, page_dir: str, link_resolver: Callable[[str],str]) -> str:
+        sym = index[sym_id]
+        digest = sym.get('source_digest', '')
+        key = (sym_id, page_dir)
+        cached = self.entries.get(key)
+        if cached is not None and digest and cached.digest == digest and \
+                all(index.symbol_permalink(ref) == link for ref, link in cached.links.items()):
+            return cached.html
+        links: dict[str, str|None] = {}
+        html = cxx_tokens_to_html(sym.get('source') or [], index, {sym_id}, link_resolver, links)
+        self.entries[key] = CachedSignature(digest, links, html)
+        return html
@@ -1,6 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import TextIO
+import json
 import re
+import sys
+from .memory import deep_sizeof
 
 
 class SymbolType(Enum):
@@ -84,6 +88,7 @@ class CxxToken:
     type: CxxTokenType
     spelling: str
     ref: str|None = None
+    html: str|None = field(default=None, repr=False, compare=False) # Escaped <span>, filled on first render
 
     def as_dict(self) -> dict:
         return {
@@ -92,6 +97,15 @@ class CxxToken:
             'ref': self.ref
         }
 
+# Symbol fields reported together by Index.memory_report
+field_groups = {
+    'source': 'source tokens',
+    'source_digest': 'source tokens',
+    'spelling': 'names',
+    'name': 'names',
+    'full_name': 'names',
+}
+
 class Index:
     symbols: dict[str, dict]
     files: dict[str, list[CxxToken]]
@@ -209,7 +223,37 @@ class Index:
 
     def dump(self) -> dict:
         return self.symbols
+
+    def write_jsonl(self, f: TextIO) -> None:
+        # One symbol per line, so the whole document is never built in memory
+        for id, sym in self.symbols.items():
+            f.write(json.dumps({'id': id, **sym}, sort_keys=True, default=lambda o: o.as_dict() if hasattr(o, 'as_dict') else str(o)))
+            f.write('\n')
     
+    def memory_report(self) -> dict:
+        """Retained bytes of the symbol table, by symbol type and by field.
+
+        Objects shared between symbols (interned strings, cached token HTML) are
+        counted once, for the first symbol that references them.
+        """
+        seen: set[int] = set()
+        by_type: dict[str, int] = {}
+        by_field: dict[str, int] = {'ids': sys.getsizeof(self.symbols)}
+        total = by_field['ids']
+        for sym_id, sym in self.symbols.items():
+            size = deep_sizeof(sym_id, seen) + sys.getsizeof(sym)
+            seen.add(id(sym))
+            by_field['ids'] += size
+            for key, value in sym.items():
+                field_size = deep_sizeof(key, seen) + deep_sizeof(value, seen)
+                group = field_groups.get(key, key)
+                by_field[group] = by_field.get(group, 0) + field_size
+                size += field_size
+            type = sym.get('type') or 'unknown'
+            by_type[type] = by_type.get(type, 0) + size
+            total += size
+        return {'symbols': len(self.symbols), 'total': total, 'by_type': by_type, 'by_field': by_field}
+
     @property
     def symbol_count(self) -> int:
         return len(self.symbols)
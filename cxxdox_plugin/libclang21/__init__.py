@@ -0,0 +1,5 @@
+from os import path
+from .cindex import Config
+
+# Set library file for libclang: libclang21/libclang.{dll,so,dylib}
+Config.set_library_path(path.dirname(__file__))
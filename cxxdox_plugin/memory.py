@@ -0,0 +1,102 @@
+from enum import Enum
+import sys
+import tracemalloc
+from .timing import peak_rss
+
+TOP_ALLOCATIONS = 10
+
+def deep_sizeof(obj: object, seen: set[int]) -> int:
+    """Bytes retained by `obj` and everything it references, skipping objects in `seen`.
+
+    Ids of visited objects are added to `seen`, so sharing one set across calls
+    counts shared objects once. Enum members are singletons and not counted.
+    """
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, Enum):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+    return size
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
+class MemoryTracker:
+    """Peak memory per build phase.
+
+    Records the process peak RSS at the end of each phase, or, when tracing,
+    the peak of Python allocations made during the phase (tracemalloc). Tracing
+    also keeps the top allocation sites at the end of the build.
+    """
+    enabled: bool
+    trace: bool
+    tracing: bool # tracemalloc was started here and is still running
+    peaks: dict[str, int]
+    top_allocations: list[tracemalloc.Statistic]
+
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        self.tracing = False
+        self.peaks = {}
+        self.top_allocations = []
+
+    def reset(self, enabled: bool, trace: bool) -> None:
+        self.enabled = enabled or trace
+        self.trace = trace
+        self.peaks = {}
+        self.top_allocations = []
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+
+    def start(self, phase: str) -> None:
+        if self.tracing:
+            tracemalloc.reset_peak()
+
+    def stop(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        peak = tracemalloc.get_traced_memory()[1] if self.tracing else peak_rss()
+        if peak is not None:
+            self.peaks[phase] = max(self.peaks.get(phase, 0), peak)
+
+    def finish(self) -> None:
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.tracing = False
+            self.top_allocations = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+
+    def report(self, index_report: dict, caches: dict[str, int]) -> str:
+        def section(title: str, sizes: dict[str, int]) -> list[str]:
+            width = max([len(name) for name in sizes] + [1])
+            return [title] + [f'  {name:<{width}}  {format_size(size):>10}'
+                              for name, size in sorted(sizes.items(), key=lambda item: -item[1])]
+
+        lines = [f"Index: {index_report['symbols']} symbols, {format_size(index_report['total'])}"]
+        lines += section('By symbol type:', index_report['by_type'])
+        lines += section('By field:', index_report['by_field'])
+        lines += section('Caches:', caches)
+        peak_kind = 'traced Python allocations' if self.trace else 'process RSS'
+        lines += [f'Peak per phase ({peak_kind}):'] + [f'  {phase:<8}  {format_size(peak):>10}' for phase, peak in self.peaks.items()]
+        if self.top_allocations:
+            lines.append('Top allocation sites:')
+            for stat in self.top_allocations:
+                frame = stat.traceback[0]
+                lines.append(f'  {format_size(stat.size):>10}  {stat.count:>8} blocks  {frame.filename}:{frame.lineno}')
+        return '\n'.join(lines)
@@ -1,59 +1,114 @@
 from dataclasses import dataclass
+from functools import cached_property
 from enum import Enum
 import json
 from os import path
 import re
 import logging
 import fnmatch
-from typing import Tuple
+from typing import Iterator, Tuple
 
 from cxxdox_plugin.index import CxxToken, CxxTokenType
-from cxxdox_plugin.highlight import to_cxx_tokens
-from .libclang21.cindex import Index as ClangIndex, CursorKind, SourceRange, Cursor, TokenGroup, TranslationUnit, SourceLocation, AccessSpecifier, Config as ClangConfig
-from cxxdox_plugin.doxygen import parse_doxygen_comment
+from cxxdox_plugin.highlight import source_digest
+from .libclang21.cindex import conf, cursor_visit_callback, Index as ClangIndex, CursorKind, SourceRange, Cursor, Token, TokenKind, TokenGroup, TranslationUnit, SourceLocation, AccessSpecifier, File
+from cxxdox_plugin.doxygen_parser import parse_doxygen_comment
 from .logs import log
+from .timing import timings, peak_rss
+from .tracing import tracer, SUBTREE_MIN_CURSORS
+from .dependencies import IncludeGraph, UnitDependencies
+from .discovery import find_files
+from time import perf_counter
+from hashlib import md5
 from .index import *
-import glob
-from ctypes import cast, POINTER, c_ubyte, c_uint
-
-# Set library file for libclang: libclang21/libclang.{dll,so,dylib}
-ClangConfig.set_library_path(path.join(path.dirname(__file__), 'libclang21'))
+from ctypes import cast, POINTER, c_ubyte, c_uint, c_void_p
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+from itertools import islice
+import threading
 
 verbose = True
 
-def map_cursor_to_symbol_type(cursor: Cursor) -> SymbolType|None:
-    if cursor.kind == CursorKind.NAMESPACE:
+UMBRELLA_NAME = '__cxxdox_umbrella__'
+PARSE_OPTIONS = TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD | TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+
+def cursor_to_symbol_id(cursor: Cursor) -> str|None:
+    if cursor is None or cursor.is_null():
+        return None
+    if cursor.kind.is_declaration() or cursor.kind.is_reference():
+        symbol_id = cursor.get_usr()
+        if symbol_id:
+            return symbol_id
+        def_cursor = cursor.get_definition()
+        if def_cursor is not None and def_cursor != cursor:
+            return cursor_to_symbol_id(def_cursor)
+    return None
+
+def to_cxx_tokens(tokens: Iterator[Token], source: bytes, indent: int = 0) -> list[CxxToken]:
+    result: list[CxxToken] = []
+
+    last_pos = None
+    for t in tokens:
+        if last_pos is not None:
+            if t.extent.start.offset > last_pos:
+                gap = source[last_pos : t.extent.start.offset]
+                gap = gap.replace(b'\r\n', b'\n')
+                gap = gap.replace(b'\n' + indent * b' ', b'\n')
+                result.append(CxxToken(type=CxxTokenType.WHITESPACE, spelling=gap.decode('utf-8')))
+
+        ref: str|None = None
+        if t.kind == TokenKind.IDENTIFIER:
+            token_type = CxxTokenType.IDENTIFIER
+            ref = cursor_to_symbol_id(t.cursor)
+        elif t.kind == TokenKind.KEYWORD:
+            token_type = CxxTokenType.KEYWORD
+        elif t.kind == TokenKind.LITERAL:
+            token_type = CxxTokenType.LITERAL
+        elif t.kind == TokenKind.COMMENT:
+            token_type = CxxTokenType.COMMENT
+        elif t.kind == TokenKind.PUNCTUATION:
+            token_type = CxxTokenType.PUNCTUATION
+        else:
+            token_type = CxxTokenType.UNKNOWN
+
+        result.append(CxxToken(type=token_type, spelling=t.spelling, ref=ref))
+
+        last_pos = t.extent.end.offset
+    return result
+
+def map_cursor_to_symbol_type(info: 'CursorInfo') -> SymbolType|None:
+    kind = info.kind
+    if kind == CursorKind.NAMESPACE:
         return SymbolType.NAMESPACE
-    elif cursor.kind in [CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD, CursorKind.FUNCTION_TEMPLATE]:
-        if cursor.spelling.startswith('<deduction guide'):
+    elif kind in [CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD, CursorKind.FUNCTION_TEMPLATE]:
+        if info.spelling.startswith('<deduction guide'):
             return SymbolType.DEDUCTION_GUIDE
         return SymbolType.FUNCTION
-    elif cursor.kind == CursorKind.CONSTRUCTOR:
+    elif kind == CursorKind.CONSTRUCTOR:
         return SymbolType.CONSTRUCTOR
-    elif cursor.kind == CursorKind.DESTRUCTOR:
+    elif kind == CursorKind.DESTRUCTOR:
         return SymbolType.DESTRUCTOR
-    elif cursor.kind == CursorKind.CONVERSION_FUNCTION:
+    elif kind == CursorKind.CONVERSION_FUNCTION:
         return SymbolType.OPERATOR
-    elif cursor.kind in [CursorKind.CLASS_DECL, CursorKind.CLASS_TEMPLATE, CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION]:
+    elif kind in [CursorKind.CLASS_DECL, CursorKind.CLASS_TEMPLATE, CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION]:
         return SymbolType.CLASS
-    elif cursor.kind == CursorKind.STRUCT_DECL:
+    elif kind == CursorKind.STRUCT_DECL:
         return SymbolType.STRUCT
-    elif cursor.kind == CursorKind.UNION_DECL:
+    elif kind == CursorKind.UNION_DECL:
         return SymbolType.UNION
-    elif cursor.kind in [CursorKind.TYPEDEF_DECL, CursorKind.TYPE_ALIAS_DECL, CursorKind.USING_DECLARATION, CursorKind.TYPE_ALIAS_TEMPLATE_DECL]:
+    elif kind in [CursorKind.TYPEDEF_DECL, CursorKind.TYPE_ALIAS_DECL, CursorKind.USING_DECLARATION, CursorKind.TYPE_ALIAS_TEMPLATE_DECL]:
         return SymbolType.TYPEDEF
-    elif cursor.kind == CursorKind.ENUM_DECL:
+    elif kind == CursorKind.ENUM_DECL:
         return SymbolType.ENUM
-    elif cursor.kind == CursorKind.ENUM_CONSTANT_DECL:
+    elif kind == CursorKind.ENUM_CONSTANT_DECL:
         return SymbolType.ENUM_CONSTANT
-    elif cursor.kind in [CursorKind.VAR_DECL, CursorKind.FIELD_DECL]:
+    elif kind in [CursorKind.VAR_DECL, CursorKind.FIELD_DECL]:
         return SymbolType.VARIABLE
-    elif cursor.kind == CursorKind.CONCEPT_DECL:
+    elif kind == CursorKind.CONCEPT_DECL:
         return SymbolType.CONCEPT
-    elif cursor.kind == CursorKind.MACRO_DEFINITION:
+    elif kind == CursorKind.MACRO_DEFINITION:
         return SymbolType.MACRO
-    elif cursor.kind == CursorKind.UNEXPOSED_DECL:
-        decl_ptr = cursor.data[0]  # pointer to Decl
+    elif kind == CursorKind.UNEXPOSED_DECL:
+        decl_ptr = info.cursor.data[0]  # pointer to Decl
         if not decl_ptr:
             raise ValueError("Decl pointer is NULL")
 
@@ -63,7 +118,7 @@ def map_cursor_to_symbol_type(cursor: Cursor) -> SymbolType|None:
         # read byte at offset 28
         decl_kind = byte_ptr[28] & 0x7F
         if decl_kind == 69:
-            log.warning(f"Unexposed decl kind: {decl_kind} for cursor {cursor.spelling} ({cursor.kind})")
+            log.warning(f"Unexposed decl kind: {decl_kind} for cursor {info.spelling} ({info.kind})")
             return SymbolType.VARIABLE
     return None
 
@@ -97,10 +152,131 @@ def cursor_as_dict(cursor):
         'usr': cursor.get_usr(),
     }
 
+def file_key(file: File) -> int:
+    # Address of the CXFile handle, the same for every location in the file within one TU
+    return cast(file.obj, c_void_p).value or 0
+
+class PatternMatcher:
+    """Matches names against a list of `fnmatch` patterns using one combined regex.
+
+    With `memoize`, results are cached per name, for names that repeat (files).
+    """
+    regex: re.Pattern|None
+    cache: dict[str, bool]|None
+
+    def __init__(self, patterns: list[str], memoize: bool = False):
+        self.regex = re.compile('|'.join(fnmatch.translate(path.normcase(pattern)) for pattern in patterns)) if patterns else None
+        self.cache = {} if memoize else None
+
+    def matches(self, name: str) -> bool:
+        if self.regex is None:
+            return False
+        if self.cache is None:
+            return self.regex.match(path.normcase(name)) is not None
+        result = self.cache.get(name)
+        if result is None:
+            result = self.cache[name] = self.regex.match(path.normcase(name)) is not None
+        return result
+
+class CursorInfo:
+    """Attributes of one cursor, each read from libclang at most once.
+
+    The bindings run a null check (an FFI call of its own) on every Cursor
+    property access and don't cache file names, USRs or raw comments.
+    """
+    cursor: Cursor
+    kind: CursorKind
+
+    def __init__(self, cursor: Cursor):
+        self.cursor = cursor
+        self.kind = cursor.kind
+
+    @cached_property
+    def spelling(self) -> str:
+        return self.cursor.spelling
+
+    @cached_property
+    def displayname(self) -> str:
+        return self.cursor.displayname
+
+    @cached_property
+    def source_location(self) -> SourceLocation:
+        return self.cursor.location
+
+    @cached_property
+    def file(self) -> File|None:
+        return self.source_location.file
+
+    @cached_property
+    def location(self) -> tuple[str|None, int]:
+        file = self.file
+        return (file.name if file else None), self.source_location.line
+
+    @property
+    def file_name(self) -> str|None:
+        return self.location[0]
+
+    @property
+    def line(self) -> int:
+        return self.location[1]
+
+    @cached_property
+    def extent(self) -> SourceRange:
+        return self.cursor.extent
+
+    @cached_property
+    def extent_files(self) -> tuple[str|None, str|None]:
+        start, end = self.extent.start.file, self.extent.end.file
+        return (start.name if start else None), (end.name if end else None)
+
+    @cached_property
+    def usr(self) -> str:
+        return self.cursor.get_usr()
+
+    @cached_property
+    def access_specifier(self) -> AccessSpecifier:
+        return self.cursor.access_specifier
+
+    @cached_property
+    def raw_comment(self) -> str|None:
+        return self.cursor.raw_comment
+
+    @cached_property
+    def is_definition(self) -> bool:
+        return self.cursor.is_definition()
+
+    @cached_property
+    def semantic_parent(self) -> 'CursorInfo|None':
+        parent = self.cursor.semantic_parent
+        return CursorInfo(parent) if parent is not None else None
+
 @dataclass
 class Source:
     content: bytes
     group: str|None
+    digest: str
+
+@dataclass
+class ParseStats:
+    file: str
+    parse_time: float = 0.0
+    walk_time: float = 0.0
+    cursors: int = 0
+    symbols_added: int = 0
+    tokens: int = 0
+    diagnostics: int = 0
+    files_skipped: int = 0 # Headers already indexed from an earlier TU
+    peak_rss_delta: int|None = None # Growth of the process peak RSS in bytes, None where unsupported or parsed on a thread pool
+    reused: bool = False # Symbols taken from the previous build, nothing parsed
+
+@dataclass
+class ParsedUnit:
+    """Symbols of one TU and what they were produced from, for incremental rebuilds."""
+    options: tuple
+    dependencies: UnitDependencies
+    symbols: list[tuple[str, dict]]
+    walked_files: list[tuple[str, str]]
+    skipped_files: list[tuple[str, str]] # Files left to the TUs that indexed them first
 
 class Parser:
     clang_args: list[str]
@@ -108,20 +284,55 @@ class Parser:
     clang_index: ClangIndex
     translation_unit: TranslationUnit
     file_path: str
+    allowed_dirs: list[str] # Real paths of the input root and of the matched inputs' directories, empty to allow all
+    allowed_files: dict[int, bool] # File handle address -> whether its cursors are walked, per TU
+    scope_groups: dict[int, str|None] # Decl address of a scope -> its @ingroup, inherited or own, per TU
+    indexed_files: set[tuple[str, str]] # (path, content digest) of files walked by earlier TUs
+    walked_files: list[tuple[str, str]] # Same for the current TU
+    skipped_files: list[tuple[str, str]] # Files of the current TU found in indexed_files
+    inclusions: list[tuple[str, str]] # (including file, included file) of the current TU
+    input_dirs: dict[str, str] # File -> directory of the umbrella input that first includes it
+    incremental: bool
+    include_graph: IncludeGraph
+    unit_symbols: list[tuple[str, dict]]|None # Symbols of the current TU, kept when incremental
+    reused_units: list[tuple[str, ParsedUnit]]
+    threads: int # Clang parses TUs on this many threads when above 1
     ignored_file_patterns: list[str]
     ignored_symbol_patterns: list[str]
+    ignored_files: PatternMatcher
+    ignored_symbols: PatternMatcher
+    stats: list[ParseStats]
+    current_stats: ParseStats
 
     per_file_doc: dict[str, dict] = {}
     per_group_doc: dict[str, dict] = {}
     source_cache: dict[str, Source] = {} # Class variable to cache file contents
+    units: dict[str, ParsedUnit] = {} # Class variable, survives `mkdocs serve` rebuilds
 
     def __init__(self, index: Index, clang_args: list[str] = [], ignored_file_patterns: list[str] = [], 
-                 ignored_symbol_patterns: list[str] = []):
+                 ignored_symbol_patterns: list[str] = [], incremental: bool = False, threads: int = 1):
         self.index = index
         self.clang_args = clang_args
         self.ignored_file_patterns = ignored_file_patterns
         self.ignored_symbol_patterns = ignored_symbol_patterns
+        self.ignored_files = PatternMatcher(ignored_file_patterns or [], memoize=True)
+        self.ignored_symbols = PatternMatcher(ignored_symbol_patterns or [])
+        self.allowed_dirs = []
+        self.allowed_files = {}
+        self.scope_groups = {}
+        self.indexed_files = set()
+        self.walked_files = []
+        self.skipped_files = []
+        self.inclusions = []
+        self.input_dirs = {}
+        self.incremental = incremental
+        self.include_graph = IncludeGraph()
+        self.unit_symbols = None
+        self.reused_units = []
+        self.threads = threads
         self.clang_index = ClangIndex.create()
+        self.stats = []
+        self.current_stats = ParseStats('')
 
     @staticmethod
     def _extract_doc(raw_comment: str) -> list|None:
@@ -146,21 +357,67 @@ class Parser:
 
         return parse_doxygen_comment(raw_comment.strip())
 
-    def _is_ignored(self, cursor: Cursor, fully_qualified_name: str) -> bool:
-        if cursor.location.file is None:
+    def _is_ignored(self, info: CursorInfo, fully_qualified_name: str) -> bool:
+        if info.file_name is None:
             return False
-        file_name = cursor.location.file.name
-        for pattern in (self.ignored_file_patterns or []):
-            if fnmatch.fnmatch(file_name, pattern):
-                return True
-        for pattern in (self.ignored_symbol_patterns or []):
-            if fnmatch.fnmatch(fully_qualified_name, pattern):
-                return True
-        return False
+        return self.ignored_symbols.matches(fully_qualified_name)
+
+    def _is_file_allowed(self, file: File) -> bool:
+        # Files outside the allowed directories, system headers and excluded files are not walked
+        file_name = file.name
+        if self.allowed_dirs:
+            real_name = path.realpath(file_name)
+            if not any(real_name.startswith(dir + path.sep) for dir in self.allowed_dirs):
+                return False
+        if SourceLocation.from_offset(self.translation_unit, file, 0).is_in_system_header:
+            return False
+        return not self.ignored_files.matches(file_name)
 
     @staticmethod
-    def _is_scope(cursor: Cursor) -> bool:
-        return cursor.kind in [CursorKind.NAMESPACE, CursorKind.CLASS_DECL,
+    def _indexed_file_key(file: File) -> tuple[str, str]|None:
+        file_name = path.abspath(file.name)
+        if not path.isfile(file_name):
+            return None # Passed to clang from memory (umbrella source)
+        return file_name, Parser._read_source(file_name).digest
+
+    def _collect_allowed_files(self) -> None:
+        # Classifies every file of the TU once, the walk then needs a single
+        # lookup by handle per cursor. Files an earlier TU has walked with the
+        # same contents are skipped, their symbols are in the index already
+        self.allowed_files = {}
+        inclusions = list(self.translation_unit.get_includes())
+        self.inclusions = [(inclusion.source.name, inclusion.include.name) for inclusion in inclusions]
+        self.input_dirs = {}
+        if path.splitext(path.basename(self.file_path))[0] == UMBRELLA_NAME:
+            # Paths are shown relative to the input a file comes from, as when each input is its own TU
+            for source, include in self.inclusions:
+                if include not in self.input_dirs:
+                    self.input_dirs[include] = self.input_dirs.get(source) or path.dirname(include)
+        self.walked_files = []
+        self.skipped_files = []
+        self._classify_file(self.translation_unit.get_file(self.file_path), main_file=True)
+        for inclusion in inclusions:
+            if file_key(inclusion.include) not in self.allowed_files:
+                self._classify_file(inclusion.include)
+
+    def _classify_file(self, file: File, main_file: bool = False) -> bool:
+        allowed = main_file or self._is_file_allowed(file)
+        if allowed:
+            indexed_key = Parser._indexed_file_key(file)
+            if indexed_key is None:
+                pass
+            elif indexed_key in self.indexed_files:
+                self.current_stats.files_skipped += 1
+                self.skipped_files.append(indexed_key)
+                allowed = False
+            else:
+                self.walked_files.append(indexed_key)
+        self.allowed_files[file_key(file)] = allowed
+        return allowed
+
+    @staticmethod
+    def _is_scope(info: CursorInfo) -> bool:
+        return info.kind in [CursorKind.NAMESPACE, CursorKind.CLASS_DECL,
                 CursorKind.STRUCT_DECL, CursorKind.UNION_DECL,
                 CursorKind.CLASS_TEMPLATE, CursorKind.ENUM_DECL,
                 CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION]
@@ -174,7 +431,7 @@ class Parser:
             contents: bytes = b''
             with open(file_name, 'rb') as f:
                 contents = f.read()
-            Parser.source_cache[file_name] = Source(contents, Parser._parse_file_doc(contents))
+            Parser.source_cache[file_name] = Source(contents, Parser._parse_file_doc(contents), md5(contents).hexdigest())
             return Parser.source_cache[file_name]
     
     @staticmethod
@@ -186,20 +443,22 @@ class Parser:
         result = to_cxx_tokens(tokens, source)
         return result
     
-    @staticmethod
-    def _extract_symbol_group(cursor: Cursor) -> str|None:
-        if cursor.is_null():
-            return None
-        if raw_comment := cursor.raw_comment:
+    def _extract_symbol_group(self, info: CursorInfo) -> str|None:
+        if raw_comment := info.raw_comment:
             raw_comment = raw_comment.strip()
             m = re.search(r'[@\\]ingroup\s+([^\s]+)', raw_comment)
             if m:
                 return m.group(1)
         
-        if cursor.semantic_parent is not None:
-            return Parser._extract_symbol_group(cursor.semantic_parent)
-        else:
+        parent = info.semantic_parent
+        if parent is None:
             return None
+        # Resolved once per scope and reused by all its members
+        key = parent.cursor.data[0]
+        if key in self.scope_groups:
+            return self.scope_groups[key]
+        group = self.scope_groups[key] = self._extract_symbol_group(parent)
+        return group
         
     @staticmethod
     def _parse_file_doc(contents: bytes) -> str|None:
@@ -228,44 +487,38 @@ class Parser:
                         return item['addtogroup']['name']
         return file_group
 
-    @staticmethod
-    def _extract_group(cursor: Cursor) -> str|None:
-        if group := Parser._extract_symbol_group(cursor):
+    def _extract_group(self, info: CursorInfo) -> str|None:
+        if group := self._extract_symbol_group(info):
             return group
         
-        extent: SourceRange = cursor.extent
-        start: SourceLocation = extent.start
-        end: SourceLocation = extent.end
-        if start.file is None or end.file is None:
-            log.warning(f'Warning: Extent has no associated file: {cursor.spelling}')
+        start_file, end_file = info.extent_files
+        if start_file is None or end_file is None:
+            log.warning(f'Warning: Extent has no associated file: {info.spelling}')
             return None
-        if start.file.name != end.file.name:
-            log.warning(f'Warning: Extent spans multiple files: {cursor.spelling}')
+        if start_file != end_file:
+            log.warning(f'Warning: Extent spans multiple files: {info.spelling}')
             return None
-        file_name = start.file.name
-        source = Parser._read_source(file_name)
+        source = Parser._read_source(start_file)
         return source.group
 
     @staticmethod
-    def _extract_source(cursor: Cursor) -> list[CxxToken]|None:
-        if cursor.kind in [CursorKind.TRANSLATION_UNIT, CursorKind.NAMESPACE]:
+    def _extract_source(info: CursorInfo) -> list[CxxToken]|None:
+        if info.kind in [CursorKind.TRANSLATION_UNIT, CursorKind.NAMESPACE]:
             return None
         
-        extent: SourceRange = cursor.extent
-        start: SourceLocation = extent.start
-        end: SourceLocation = extent.end
-        if start.file is None or end.file is None:
-            log.warning(f'Warning: Extent has no associated file: {cursor.spelling}')
+        start_file, end_file = info.extent_files
+        if start_file is None or end_file is None:
+            log.warning(f'Warning: Extent has no associated file: {info.spelling}')
             return None
-        if start.file.name != end.file.name:
-            log.warning(f'Warning: Extent spans multiple files: {cursor.spelling}')
+        if start_file != end_file:
+            log.warning(f'Warning: Extent spans multiple files: {info.spelling}')
             return None
-        file_name = start.file.name
-        source = Parser._read_source(file_name).content
+        source = Parser._read_source(start_file).content
 
-        extent = cursor.extent
+        cursor = info.cursor
+        extent: SourceRange = info.extent
         ellipsis = False
-        if cursor.kind in [CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD,
+        if info.kind in [CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD,
                            CursorKind.FUNCTION_TEMPLATE, CursorKind.CONVERSION_FUNCTION,
                            CursorKind.CONSTRUCTOR, CursorKind.DESTRUCTOR, CursorKind.CLASS_DECL, CursorKind.STRUCT_DECL,
                            CursorKind.UNION_DECL, CursorKind.CLASS_TEMPLATE,
@@ -301,14 +554,68 @@ class Parser:
         return name
 
     def _relative_path(self, full_path: str) -> str:
-        return path.relpath(full_path, path.dirname(self.file_path)).replace('\\', '/')
+        start = self.input_dirs.get(full_path) or path.dirname(self.file_path)
+        return path.relpath(full_path, start).replace('\\', '/')
 
-    def parse(self, file_path: str):
+    @staticmethod
+    def invalidate_units() -> None:
+        # Drops the kept units that are, or include, a file changed since they were parsed
+        graph = IncludeGraph({file_path: unit.dependencies for file_path, unit in Parser.units.items()})
+        changed = graph.changed_files()
+        for file_name in changed:
+            Parser.source_cache.pop(path.abspath(file_name), None)
+        invalidated = graph.invalidated(changed)
+        for file_path in invalidated:
+            del Parser.units[file_path]
+        if changed:
+            log.info(f'{len(changed)} changed files, re-parsing {len(invalidated)} of {len(graph.units)} translation units')
+
+    def _unit_options(self, unsaved_files: list[tuple[str, str]]|None) -> tuple:
+        return (tuple(self.clang_args), tuple(self.ignored_file_patterns or []), tuple(self.ignored_symbol_patterns or []),
+                tuple(self.allowed_dirs), tuple(unsaved_files or []))
+
+    def _reuse_unit(self, file_path: str, options: tuple) -> bool:
+        unit = Parser.units.get(file_path)
+        if unit is None or unit.options != options:
+            return False
+        saved_symbols = self.index.symbol_count
+        for id, data in unit.symbols:
+            self.index.add_symbol(id, dict(data))
+        self.indexed_files.update(unit.walked_files)
+        self.include_graph.units[file_path] = unit.dependencies
+        self.reused_units.append((file_path, unit))
+        self.stats.append(ParseStats(file_path, symbols_added=self.index.symbol_count - saved_symbols, reused=True))
+        log.info(f'Reused {len(unit.symbols)} symbols of unchanged {file_path}')
+        return True
+
+    def _parse_translation_unit(self, file_path: str, unsaved_files: list[tuple[str, str]]|None,
+                                clang_index: ClangIndex) -> tuple[TranslationUnit, float, float]:
+        # Touches no Parser state, so it can run on worker threads; ctypes
+        # releases the GIL while clang parses
+        start = perf_counter()
+        translation_unit = clang_index.parse(file_path, self.clang_args, unsaved_files, options=PARSE_OPTIONS)
+        end = perf_counter()
+        tracer.add('clang parse', 'parse', start, end, file=file_path)
+        return translation_unit, start, end
+
+    def parse(self, file_path: str, unsaved_files: list[tuple[str, str]]|None = None):
+        options = self._unit_options(unsaved_files)
+        if self.incremental and self._reuse_unit(file_path, options):
+            return
         log.info(f'Parsing c/c++ file: {file_path}')
+        saved_rss = peak_rss()
+        translation_unit, start, end = self._parse_translation_unit(file_path, unsaved_files, self.clang_index)
+        self._index_translation_unit(file_path, options, translation_unit, start, end, saved_rss)
+
+    def _index_translation_unit(self, file_path: str, options: tuple, translation_unit: TranslationUnit,
+                                parse_start: float, parse_end: float, saved_rss: int|None) -> None:
         saved_symbols = self.index.symbol_count
         self.file_path = file_path
-        self.translation_unit = self.clang_index.parse(file_path, self.clang_args, 
-                                                       options=TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD | TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
+        stats = ParseStats(file_path)
+        self.stats.append(stats)
+        stats.parse_time = parse_end - parse_start
+        timings.add('clang parse', stats.parse_time, file_path)
+        self.translation_unit = translation_unit
         if not self.translation_unit:
             log.warning(f'Unable to load input: {file_path}')
             self.file_path = ''
@@ -318,27 +625,98 @@ class Parser:
             self.file_path = ''
             return
 
-        if verbose and len(self.translation_unit.diagnostics):
+        stats.diagnostics = len(self.translation_unit.diagnostics)
+        if verbose and stats.diagnostics:
             log.warning('------------DIAGNOSTICS---------------')
             for diag in self.translation_unit.diagnostics:
                 log.warning(diag)
             log.warning('------------/DIAGNOSTICS---------------')
-        self._parse_recursive(self.translation_unit.cursor)
-
-        added_symbols = self.index.symbol_count - saved_symbols
-        log.info(f'Added {added_symbols} symbols from {file_path}')
-
-    def parse_glob(self, include_patterns: list[str], exclude_patterns: list[str], root_dir: str):
-        files = []
-        for pattern in include_patterns:
-            matched = glob.glob(path.join(root_dir, pattern), recursive=True)
-            files.extend(matched)
-        for pattern in exclude_patterns:
-            excluded = glob.glob(path.join(root_dir, pattern), recursive=True)
-            files = [f for f in files if f not in excluded]
-        files = set(files) # Remove duplicates
-        for file in files:
-            self.parse(file)
+        self.current_stats = stats
+        start = perf_counter()
+        self._collect_allowed_files()
+        self.scope_groups = {}
+        self.unit_symbols = [] if self.incremental else None
+        self._walk(self.translation_unit.cursor)
+        self.indexed_files.update(self.walked_files)
+        dependencies = self.include_graph.record(file_path, self.inclusions)
+        if self.unit_symbols is not None:
+            Parser.units[file_path] = ParsedUnit(options, dependencies, self.unit_symbols, self.walked_files, self.skipped_files)
+            self.unit_symbols = None
+        stats.walk_time = perf_counter() - start
+        timings.add('ast walk', stats.walk_time, file_path)
+        tracer.add('ast walk', 'parse', start, start + stats.walk_time, file=file_path, cursors=stats.cursors)
+
+        stats.symbols_added = self.index.symbol_count - saved_symbols
+        if saved_rss is not None:
+            stats.peak_rss_delta = peak_rss() - saved_rss
+        log.info(f'Added {stats.symbols_added} symbols from {file_path}')
+        tracer.add('parse', 'parse', parse_start, file=file_path, symbols=stats.symbols_added)
+
+    def parse_umbrella(self, files: list[str], root_dir: str):
+        # One TU for all files: a generated source in root_dir that includes each
+        # of them, passed to clang from memory. Shared headers are parsed and
+        # walked once, symbols keep their real locations. Files are expected to
+        # have include guards, as they would in any other TU. Always parsed as C++
+        files = sorted(files)
+        file_path = path.join(root_dir, UMBRELLA_NAME + '.hpp')
+        includes = [path.abspath(file).replace('\\', '/') for file in files]
+        contents = ''.join(f'#include "{include}"\n' for include in includes)
+        self.parse(file_path, unsaved_files=[(file_path, contents)])
+
+    def parse_glob(self, include_patterns: list[str], exclude_patterns: list[str], root_dir: str, umbrella: bool = False):
+        with timings.measure('file discovery'):
+            files = find_files(include_patterns, exclude_patterns, root_dir)
+        self._set_allowed_dirs([root_dir] + [path.dirname(file) for file in files])
+        if umbrella and files:
+            self.parse_umbrella(files, root_dir)
+            return
+        if self.threads > 1 and len(files) > 1:
+            self._parse_threaded(files)
+        else:
+            for file in files:
+                self.parse(file)
+        for file, unit in self.reused_units:
+            if not self.indexed_files.issuperset(unit.skipped_files):
+                # The input that indexed a file it skipped is gone
+                del Parser.units[file]
+                self.stats = [stats for stats in self.stats if not (stats.reused and stats.file == file)]
+                self.parse(file)
+
+    def _set_allowed_dirs(self, dirs: list[str]) -> None:
+        # Inputs matched through '..' or symlinks may lie outside the root, the
+        # headers next to them are walked too. Nested directories are dropped
+        self.allowed_dirs = []
+        for dir in sorted({path.realpath(dir) for dir in dirs}):
+            if not any((dir + path.sep).startswith(allowed + path.sep) for allowed in self.allowed_dirs):
+                self.allowed_dirs.append(dir)
+
+    def _parse_threaded(self, files: list[str]) -> None:
+        # Clang parses on a pool of threads, each with its own CXIndex, while
+        # this thread walks the parsed TUs in input order. Walking one TU
+        # overlaps with parsing the next ones; at most `threads` TUs are
+        # parsed or being parsed ahead of the walk
+        local = threading.local()
+
+        def parse_on_worker(file_path: str) -> tuple[TranslationUnit, float, float]:
+            if not hasattr(local, 'clang_index'):
+                local.clang_index = ClangIndex.create()
+            return self._parse_translation_unit(file_path, None, local.clang_index)
+
+        options = self._unit_options(None)
+        queued = iter([file for file in files if not (self.incremental and self._reuse_unit(file, options))])
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='clang') as executor:
+            ahead: deque[tuple[str, Future]] = deque()
+            for file_path in islice(queued, self.threads):
+                log.info(f'Parsing c/c++ file: {file_path}')
+                ahead.append((file_path, executor.submit(parse_on_worker, file_path)))
+            while ahead:
+                file_path, future = ahead.popleft()
+                translation_unit, start, end = future.result()
+                for next_path in islice(queued, 1):
+                    log.info(f'Parsing c/c++ file: {next_path}')
+                    ahead.append((next_path, executor.submit(parse_on_worker, next_path)))
+                # Other TUs are parsed meanwhile, the process peak RSS can't be attributed to one
+                self._index_translation_unit(file_path, options, translation_unit, start, end, None)
 
     @staticmethod
     def _split_brief(doc: list[str|dict]) -> tuple[str,list]:
@@ -359,13 +737,74 @@ class Parser:
                     return brief, doc
         return '', doc
 
-    def _parse_recursive(self, cursor: Cursor, path: list = [], parent_id: str|None = None):
-        rel_path = self._relative_path(str(cursor.location.file.name)) if cursor.location.file else None
-
-        type = map_cursor_to_symbol_type(cursor)
-
-        spelling: str = cursor.spelling
-        displayname: str = cursor.displayname
+    def _walk(self, root: Cursor) -> None:
+        # A single clang_visitChildren over the whole tree. The visitor gets every
+        # cursor with its parent and returns CXChildVisit_Recurse to descend or
+        # CXChildVisit_Continue to prune; the scope state of each open parent
+        # (path, parent id) is kept on a stack keyed by the parent cursor's bytes
+        stats = self.current_stats
+        allowed_files = self.allowed_files
+        scope = self._parse_cursor(CursorInfo(root), [], None)
+        if scope is None:
+            return
+        # (cursor bytes, path, parent id, name, start time, cursor count at start)
+        scopes: list[tuple[bytes, list, str|None, str, float, int]] = [(bytes(root), *scope, perf_counter(), stats.cursors)]
+        errors: list[BaseException] = []
+
+        def close_scope() -> None:
+            _, _, _, name, start, saved_cursors = scopes.pop()
+            if tracer.enabled and stats.cursors - saved_cursors >= SUBTREE_MIN_CURSORS:
+                tracer.add('subtree', 'parse', start, scope=name or self.file_path,
+                           cursors=stats.cursors - saved_cursors)
+
+        def visitor(child: Cursor, parent: Cursor, _) -> int:
+            try:
+                parent_key = bytes(parent)
+                while scopes[-1][0] != parent_key:
+                    close_scope()
+                info = CursorInfo(child)
+                file = info.file
+                if file is None: # Built-in and command line macros
+                    return 1 # CXChildVisit_Continue
+                key = file_key(file)
+                allowed = allowed_files.get(key)
+                if allowed is None: # Not among the TU's inclusions
+                    allowed = self._classify_file(file)
+                if not allowed:
+                    return 1
+                if info.kind.is_statement() or info.kind.is_expression():
+                    return 1
+                child._tu = root._tu # Keep the TU alive as long as the cursor
+                _, path, parent_id, _, _, _ = scopes[-1]
+                scope = self._parse_cursor(info, path, parent_id)
+                if scope is None:
+                    return 1
+                scopes.append((bytes(child), *scope, perf_counter() if tracer.enabled else 0.0, stats.cursors))
+                return 2 # CXChildVisit_Recurse
+            except BaseException as e:
+                # ctypes would print and swallow it, stop the walk and re-raise below
+                errors.append(e)
+                return 0 # CXChildVisit_Break
+
+        conf.lib.clang_visitChildren(root, cursor_visit_callback(visitor), None)
+        if errors:
+            raise errors[0]
+        while scopes:
+            close_scope()
+
+    def _parse_cursor(self, info: CursorInfo, path: list, parent_id: str|None) -> tuple[list, str|None, str]|None:
+        """Adds the cursor's symbol to the index.
+
+        Returns the path, parent id and name its children are parsed with, or
+        None if its subtree is to be skipped.
+        """
+        self.current_stats.cursors += 1
+        rel_path = self._relative_path(info.file_name) if info.file_name is not None else None
+
+        type = map_cursor_to_symbol_type(info)
+
+        spelling: str = info.spelling
+        displayname: str = info.displayname
 
         if type == SymbolType.DEDUCTION_GUIDE:
             spelling = spelling.removeprefix('<deduction guide for ').removesuffix('>')
@@ -377,16 +816,16 @@ class Parser:
 
         fully_qualified_name: str = '::'.join(path + [displayname])
 
-        if self._is_ignored(cursor, fully_qualified_name):
-            return
+        if self._is_ignored(info, fully_qualified_name):
+            return None
         
         access_spec = ''
-        if cursor.access_specifier == AccessSpecifier.PROTECTED:
+        if info.access_specifier == AccessSpecifier.PROTECTED:
             access_spec = 'protected'
-        elif cursor.access_specifier == AccessSpecifier.PUBLIC:
+        elif info.access_specifier == AccessSpecifier.PUBLIC:
             access_spec = 'public'
-        elif cursor.access_specifier == AccessSpecifier.PRIVATE:
-            return
+        elif info.access_specifier == AccessSpecifier.PRIVATE:
+            return None
 
         symbol_dict = {
             'type': str(type),
@@ -395,23 +834,29 @@ class Parser:
             'full_name': fully_qualified_name,
             'parent': parent_id,
         }
-        if type is not None and not cursor.kind == CursorKind.NAMESPACE:
-            if cursor.extent.start.file is None:
-                return
-            if not cursor.spelling:
-                log.error(f"Cursor with no spelling: {cursor_as_dict(cursor)}")
-                return
+        if type is not None and not info.kind == CursorKind.NAMESPACE:
+            if info.extent_files[0] is None:
+                return None
+            if not info.spelling:
+                log.error(f"Cursor with no spelling: {cursor_as_dict(info.cursor)}")
+                return None
             if rel_path:
                 symbol_dict['file'] = rel_path
-                symbol_dict['line'] = cursor.location.line
+                symbol_dict['line'] = info.line
 
-                if src := Parser._extract_source(cursor):
+                with timings.measure('tokenize'):
+                    src = Parser._extract_source(info)
+                if src:
+                    self.current_stats.tokens += len(src)
                     symbol_dict['source'] = src
+                    symbol_dict['source_digest'] = source_digest(src)
                 
-                if group := Parser._extract_group(cursor):
+                if group := self._extract_group(info):
                     symbol_dict['group'] = group
 
-            if doc := Parser._extract_doc(cursor.raw_comment):
+            with timings.measure('doxygen'):
+                doc = Parser._extract_doc(info.raw_comment)
+            if doc:
                 brief, details = Parser._split_brief(doc)
                 symbol_dict['brief'] = brief
                 symbol_dict['details'] = details
@@ -419,22 +864,19 @@ class Parser:
             if access_spec:
                 symbol_dict['access'] = access_spec
 
-            if cursor.is_definition():
+            if info.is_definition:
                 symbol_dict['is_definition'] = True
 
-        if Parser._is_scope(cursor):
-            parent_id = cursor.get_usr()
+        if Parser._is_scope(info):
+            parent_id = info.usr
             path = path + [displayname]
             
         if type is not None:
-            self.index.add_symbol(cursor.get_usr(), symbol_dict)
-
-        for child in cursor.get_children():
-            if child.location.is_in_system_header:
-                continue
-            if child.kind.is_statement() or child.kind.is_expression():
-                continue
-            self._parse_recursive(child, path, parent_id)
+            if self.unit_symbols is not None:
+                self.unit_symbols.append((info.usr, dict(symbol_dict))) # The index may update its copy
+            self.index.add_symbol(info.usr, symbol_dict)
+
+        return path, parent_id, fully_qualified_name
 
 if __name__ == '__main__':
     dir = 'demo'
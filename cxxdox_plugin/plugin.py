@@ -1,28 +1,43 @@
-from typing import Any, Callable, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Tuple
 from cxxdox_plugin.doxygen import doxygen_to_html, escape
 import mkdocs.plugins
 import logging
 import os
+import sys
+import posixpath
+import gzip
 import json
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from mkdocs.structure.files import File, Files
 from mkdocs.config.defaults import MkDocsConfig
 from mkdocs.structure.pages import Page
 from mkdocs.structure.nav import Section
+from mkdocs.structure.toc import get_toc
 from mkdocs.structure import StructureItem
 from .config import CxxDoxConfig
-from .parser import Parser, Index, SymbolType
+from .index import Index, SymbolType
 from .logs import log
 from hashlib import md5
-from mkdocs.utils import copy_file
+from mkdocs.utils import copy_file, get_relative_url
 from pathlib import Path
+from markdown import Markdown
 from .extension import CxxDoxExtension
+from .renderer import SymbolPageRenderer
+from .highlight import SignatureCache
+from .timing import timings
+from .tracing import tracer
+from .profiling import PhaseProfiler
+from .memory import MemoryTracker, deep_sizeof
+from time import perf_counter
 from mkdocs.structure.nav import Navigation
 from urllib.parse import urlparse
 from pathlib import PurePosixPath
 from mkdocs.utils import find_or_create_node
 
+if TYPE_CHECKING:
+    from .clang_calls import LibclangCallCounter
+
 @dataclass
 class IndexPage:
     name: str
@@ -65,11 +80,25 @@ index_pages = [
     IndexPage("macros/index.md", "Macros", [SymbolType.MACRO.value], SymbolType.all_and_none()),
 ]
 
+@dataclass
+class ListEntry:
+    id: str
+    letter: str
+
+@dataclass
+class ListBuckets:
+    pages: list[list[ListEntry]] # Parallel to index_pages
+    groups: dict[str, list[ListEntry]]
+    children: dict[str|None, list[ListEntry]]
+
 @dataclass 
 class DocPage:
     id: str
     full: bool = False
 
+uri_unsafe_chars = re.compile(r'[^a-z0-9_\.]+')
+non_word_chars = re.compile(r'[^\w]')
+
 def plural(t: str) -> str:
     if t.endswith('y'):
         return t[:-1] + 'ies'
@@ -80,36 +109,53 @@ def plural(t: str) -> str:
 
 class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
     css_filename: str = "assets/cxxdox.css"
+    signature_cache: SignatureCache = SignatureCache() # Class variable, survives `mkdocs serve` rebuilds
 
     index: Index
     doc_pages: dict[str, DocPage]
     groups: set[str]
     current_uri: str|None
+    direct_pages: dict[str, str]
+    renderer: SymbolPageRenderer
+    current_url: str
+    files: Files|None
+    relative_urls: dict[Tuple[str, str], str]
+    page_render_start: float
+    relative_links: dict[Tuple[str, str], str]
+    relative_dirs: dict[Tuple[str, str], str]
+    permalink_parts: dict[str, Tuple[str, str]]
+    profiler: PhaseProfiler
+    memory: MemoryTracker
+    clang_calls: 'LibclangCallCounter|None'
 
     def __init__(self):
         self.index = Index()
         self.doc_pages = {}
         self.current_uri = None
         self.groups = set()
+        self.direct_pages = {}
+        self.renderer = SymbolPageRenderer(self.index, self.url_resolver, self.source_html)
+        self.relative_links = {}
+        self.relative_dirs = {}
+        self.permalink_parts = {}
+        self.current_url = ''
+        self.files = None
+        self.relative_urls = {}
+        self.page_render_start = 0.0
+        self.profiler = PhaseProfiler()
+        self.memory = MemoryTracker()
+        self.clang_calls = None
 
     def _map_symbols_to_pages(self, files: Files):
-        names: dict[str,dict[str,str]] = {}
-        def unique_name(id, name: str) -> str:
-            if name not in names:
-                names[name] = {id: name}
-                return name
-            d = names[name]
-            if id in d:
-                return d[id]
-            i = 1
-            while True:
-                new_name = f"{name}~{i}"
-                if new_name not in d.values():
-                    d[id] = new_name
-                    return new_name
-                i += 1                
-
-        def gen_uri(id, sym: dict) -> str:
+        # name -> number of symbols sharing it; the n-th symbol gets `name~n`.
+        # Sanitized names never contain '~', so suffixed names can't collide.
+        name_counts: dict[str, int] = {}
+        uris: dict[str, str] = {}
+        top_level_parents: dict[str, str] = {}
+
+        def gen_uri(id: str, sym: dict) -> str:
+            if id in uris:
+                return uris[id]
             full_name = sym.get('full_name', '')
             type = sym.get('type', 'unknown')
             type = type.replace('struct', 'class').replace('union', 'class')
@@ -120,20 +166,29 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
                 if SymbolType(parent_type) in SymbolType.classlike():
                     type = 'member-' + type
             uri = full_name.lower()
-            uri = re.sub(r'[^a-z0-9_\.]+', '.', uri)
+            uri = uri_unsafe_chars.sub('.', uri)
             uri = uri.strip('.')
             uri = f"{plural(type)}/{uri}"
-            return unique_name(id, uri)
+            count = name_counts.get(uri, 0)
+            name_counts[uri] = count + 1
+            if count:
+                uri = f"{uri}~{count}"
+            uris[id] = uri
+            return uri
 
         def find_top_level_parent(id: str) -> str:
-            sym = self.index[id]
-            parent_id = sym.get('parent', None)
-            if parent_id is None:
-                return id
-            parent = self.index[parent_id]
-            if parent.get('type', None) == SymbolType.NAMESPACE.value:
-                return id
-            return find_top_level_parent(parent_id)
+            chain: list[str] = []
+            while id not in top_level_parents:
+                chain.append(id)
+                parent_id = self.index[id].get('parent', None)
+                if parent_id is None or self.index[parent_id].get('type', None) == SymbolType.NAMESPACE.value:
+                    top_level_parents[id] = id
+                    break
+                id = parent_id
+            top = top_level_parents[id]
+            for id in chain:
+                top_level_parents[id] = top
+            return top
 
         all = self.index.all_symbols()
 
@@ -154,63 +209,178 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
         css_physical_path = os.path.join(os.path.dirname(__file__), self.css_filename)
         copy_file(css_physical_path, os.path.join(config.site_dir, self.css_filename))
 
+        if self.config.timing_report:
+            log.info('CxxDox build timings:\n' + timings.report())
+        if self.config.trace_events:
+            log.info(f'Writing trace events to {self.config.trace_events}')
+            with open(self.config.trace_events, 'w', encoding='utf-8') as f:
+                tracer.write(f)
+        for path in self.profiler.write():
+            log.info(f'Profile written to {path}')
+        if self.memory.enabled:
+            self.memory.finish()
+            caches = {'signature cache': deep_sizeof(self.signature_cache.entries, set())}
+            # Only loaded when there was something to parse, don't import it just to measure empty caches
+            if (parser_module := sys.modules.get(f'{__package__}.parser')) is not None:
+                Parser = parser_module.Parser
+                caches = {
+                    'Parser.source_cache': deep_sizeof(Parser.source_cache, set()),
+                    'Parser.per_file_doc': deep_sizeof(Parser.per_file_doc, set()),
+                    'Parser.per_group_doc': deep_sizeof(Parser.per_group_doc, set()),
+                    'Parser.units': deep_sizeof(Parser.units, set()),
+                    **caches,
+                }
+            log.info('CxxDox memory report:\n' + self.memory.report(self.index.memory_report(), caches))
+        if self.clang_calls is not None:
+            self.clang_calls.uninstall()
+            log.info('CxxDox libclang calls:\n' + self.clang_calls.report())
+
+    def _start_phase(self, phase: str) -> None:
+        self.profiler.start(phase)
+        self.memory.start(phase)
+
+    def _stop_phase(self, phase: str) -> None:
+        self.profiler.stop(phase)
+        self.memory.stop(phase)
+
     def on_page_markdown(self, markdown: str, /, *, page: Page, config: MkDocsConfig, files: Files) -> str | None:
         self.current_uri = page.file.src_uri
+        self.current_url = page.file.url
+        self.files = files
+        self.page_render_start = perf_counter()
+        self._start_phase('render')
+        if page.file.src_uri in self.direct_pages:
+            # Rendered directly in on_page_content, nothing for Markdown to do
+            return ''
 
     def on_page_content(self, html: str, /, *, page: Page, config: MkDocsConfig, files: Files) -> str | None:
-        return html.replace('<b class="LAUyl5Cz5B"></b>', '')
+        sym_id = self.direct_pages.get(page.file.src_uri)
+        if sym_id is not None:
+            if self.renderer.md is None:
+                self.renderer.md = self._direct_markdown(config)
+            html, toc_tokens = self.renderer.render(sym_id)
+            page.toc = get_toc(toc_tokens)
+        else:
+            html = html.replace('<b class="LAUyl5Cz5B"></b>', '')
+        self._stop_phase('render')
+        timings.add('page render', perf_counter() - self.page_render_start, page.file.src_uri)
+        tracer.add('page', 'render', self.page_render_start, page=page.file.src_uri)
+        timings.add_size('pages', len(html), page.file.src_uri)
+        return html
 
     def on_config(self, config: MkDocsConfig) -> MkDocsConfig:
 
         dir = os.path.join(config.docs_dir, self.config.root)
         log.info(f"CxxDoxPlugin configuration: {self.config}, dir: {dir}")
 
+        timings.reset()
+        timings.enabled = self.config.timing_report
+        tracer.reset()
+        tracer.enabled = bool(self.config.trace_events)
+        self.profiler.reset(self.config.profile)
+        self.memory.reset(self.config.memory_report, self.config.memory_trace)
+        self.clang_calls = None
+        if self.config.libclang_stats:
+            from .clang_calls import LibclangCallCounter
+            self.clang_calls = LibclangCallCounter()
+            self.clang_calls.install()
+
+        if self.config.input:
+            self._start_phase('parse')
+            self._parse_inputs(dir)
+            self._stop_phase('parse')
+        
+        config.extra_css.insert(0, self.css_filename)
+
+        toc_config = config.mdx_configs.get('toc', {})
+        if permalink := toc_config.get('permalink', False):
+            self.renderer.permalink = '&para;' if permalink is True else str(permalink)
+            self.renderer.permalink_class = toc_config.get('permalink_class', 'headerlink')
+            self.renderer.permalink_title = toc_config.get('permalink_title', 'Permanent link')
+
+        config.markdown_extensions.append(CxxDoxExtension(self.index, self.link_resolver, self.source_html)) # type: ignore[arg-type]
+
+        return config    
+    
+    def _parse_inputs(self, dir: str) -> None:
+        # Imported here: loading libclang and building the Doxygen grammar is only
+        # worth it when there is something to parse
+        from .parser import Parser, ParseStats
+        from .dependencies import IncludeGraph
+
+        if self.config.incremental:
+            Parser.invalidate_units()
+        else:
+            Parser.units.clear()
+        parse_stats: list[ParseStats] = []
+        include_graph = IncludeGraph()
         for input_cfg in self.config.input:
             parser = Parser(self.index,
                 clang_args=input_cfg.compile_options,
                 ignored_file_patterns=input_cfg.exclude,
-                ignored_symbol_patterns=input_cfg.exclude_symbols
+                ignored_symbol_patterns=input_cfg.exclude_symbols,
+                incremental=self.config.incremental,
+                threads=self.config.parse_threads
             )
-            parser.parse_glob(input_cfg.include, input_cfg.exclude, dir)
-        
-        config.extra_css.insert(0, self.css_filename)
+            parser.parse_glob(input_cfg.include, input_cfg.exclude, dir, input_cfg.umbrella)
+            parse_stats.extend(parser.stats)
+            include_graph.units.update(parser.include_graph.units)
 
-        config.markdown_extensions.append(CxxDoxExtension(self.index, self.link_resolver)) # type: ignore[arg-type]
+        if self.config.include_graph:
+            log.info(f'Writing include graph to {self.config.include_graph}')
+            include_graph.write(self.config.include_graph)
 
-        return config    
-    
-    def _generate_list(self, title: str, sym_ids: list[str], desc = '') -> str:
+        if self.config.parse_stats:
+            log.info(f'Writing parse statistics to {self.config.parse_stats}')
+            with open(self.config.parse_stats, 'w', encoding='utf-8') as f:
+                json.dump([asdict(stats) for stats in parse_stats], f, indent='\t')
+
+    def _generate_list(self, title: str, entries: list[ListEntry], desc = '') -> str:
+        with timings.measure('list pages', title):
+            return self._generate_list_markdown(title, entries, desc)
+
+    def _generate_list_markdown(self, title: str, entries: list[ListEntry], desc: str) -> str:
         markdown = f"# {escape(title)}\n\n"
 
         if desc:
             markdown += desc + '\n\n'
 
-        syms: list[dict] = [{**self.index[sym_id], 'id': sym_id} for sym_id in sym_ids]
-        syms.sort(key=lambda x: re.sub(r'[^\w]', '', x.get('name', '').lower()))
-
         letter = ''
-        for sym in syms:
-            name = sym.get('name', '')
-            first_letter = re.sub(r'[^\w]', '', name.upper())[0]
-            if first_letter != letter:
-                letter = first_letter
+        for entry in entries:
+            if entry.letter != letter:
+                letter = entry.letter
                 markdown += f"\n### {escape(letter)}\n\n"
 
-            id: str = sym.get('id', '')
-
-            file = sym.get('file')
-            if file:
-                file = f"({file}:{sym.get('line', '')})"
-            
-            markdown += f"- [[`{id}`:type:brief]]\n"
+            markdown += f"- [[`{entry.id}`:type:brief]]\n"
 
         return markdown
 
-    def _generate_index(self, title: str, self_type: list[str], parent_type: list[str|None]) -> str:
-        sym_ids = self.index.lookup_by_type(self_type, parent_type)
-        return self._generate_list(title, sym_ids)
+    def _bucket_symbols(self) -> ListBuckets:
+        # Sort once, then distribute: every bucket inherits the (stable) order
+        keyed = [(non_word_chars.sub('', sym.get('name', '').lower()), id, sym) for id, sym in self.index.symbols.items()]
+        keyed.sort(key=lambda item: item[0])
+
+        buckets = ListBuckets([[] for _ in index_pages], {}, {})
+        pages_by_types: dict[Tuple[str|None, str|None], list[list[ListEntry]]] = {}
+        for _, id, sym in keyed:
+            entry = ListEntry(id, non_word_chars.sub('', sym.get('name', '').upper())[:1])
+            type = sym.get('type')
+            parent_id = sym.get('parent')
+            parent_type = self.index.symbols.get(parent_id, {}).get('type') if parent_id is not None else None
+            pages = pages_by_types.get((type, parent_type))
+            if pages is None:
+                pages = [bucket for page, bucket in zip(index_pages, buckets.pages)
+                         if type in page.self_type and parent_type in page.parent_type]
+                pages_by_types[(type, parent_type)] = pages
+            for bucket in pages:
+                bucket.append(entry)
+            if group := sym.get('group'):
+                buckets.groups.setdefault(group, []).append(entry)
+            buckets.children.setdefault(parent_id, []).append(entry)
+        return buckets
 
     def on_files(self, files: Files, /, *, config: MkDocsConfig):
+        self._start_phase('index')
 
         generated_nav = []
         def add_nav(full_uri: str, title: str):
@@ -224,15 +394,28 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
 
             branch.append({title: full_uri})
         
+        # Permalinks are reassigned below, drop links resolved by the previous build
+        self.relative_links.clear()
+        self.permalink_parts.clear()
+        self.relative_urls.clear()
+
         log.info('Generating symbol permalinks...')
-        self._map_symbols_to_pages(files)
+        with timings.measure('permalinks'):
+            self._map_symbols_to_pages(files)
 
         low_rank = '---\nsearch:\n  boost: 0.5\n---\n\n'
 
-        with open('out.json', 'w') as f:
-            json.dump(self.index.dump(), f, indent='\t', sort_keys=True, default=lambda o: o.as_dict() if hasattr(o, 'as_dict') else str(o))
+        if self.config.dump_index:
+            log.info(f'Writing symbol index to {self.config.dump_index}')
+            open_dump = gzip.open if self.config.dump_index.endswith('.gz') else open
+            with open_dump(self.config.dump_index, 'wt', encoding='utf-8') as f:
+                self.index.write_jsonl(f)
+
+        with timings.measure('list bucketing'):
+            buckets = self._bucket_symbols()
 
         if self.groups:
+            from .parser import Parser
             log.info('Generating groups...')
 
             groups_list = low_rank + "# Groups\n\n"
@@ -245,11 +428,12 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
                         group_title = title
                         groups_list += title + '\n\n'
                     if desc := group_info.get('desc', ''):
-                        group_desc = doxygen_to_html(desc, self.index, '', self.link_resolver) + '\n\n'
+                        # Embedded in Markdown, double the backslashes so escapes give them back
+                        group_desc = doxygen_to_html(desc, self.index, '', self.link_resolver).replace('\\', '\\\\') + '\n\n'
 
                 log.info(f"Generating group page: {self.config.path_prefix}groups/{group}.md")
                 self.current_uri = f"{self.config.path_prefix}groups/{group}.md"
-                files.append(File.generated(config, f"{self.config.path_prefix}groups/{group}.md", content=self._generate_list(f"Group: {group}", self.index.lookup_group(group), group_desc)))
+                files.append(File.generated(config, f"{self.config.path_prefix}groups/{group}.md", content=self._generate_list(f"Group: {group}", buckets.groups.get(group, []), group_desc)))
                 add_nav(f"{self.config.path_prefix}groups/{group}.md", group_title)
 
             files.append(File.generated(config, f"{self.config.path_prefix}groups/index.md", content=groups_list))
@@ -257,14 +441,16 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
 
         log.info('Generating index pages...')
 
-        for page in index_pages:
+        for page, entries in zip(index_pages, buckets.pages):
             log.info(f"Generating index page: {self.config.path_prefix+page.name} ({page.title})")
             self.current_uri = self.config.path_prefix + page.name
-            files.append(File.generated(config, f"{self.config.path_prefix+page.name}", content=low_rank+self._generate_index(page.title, page.self_type, page.parent_type)))
+            files.append(File.generated(config, f"{self.config.path_prefix+page.name}", content=low_rank+self._generate_list(page.title, entries)))
             add_nav(self.config.path_prefix+page.name, page.title)
 
         log.info('Generating symbol pages...')
 
+        self.direct_pages = {}
+
         for id, page in self.doc_pages.items():
             sym = self.index[id]
 
@@ -276,10 +462,13 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
             if '#' in perma:
                 perma = perma.split('#')[0]
             if page.full:
-                content += f"# ::: {full_name}\n\n"
+                if self.config.direct_render:
+                    self.direct_pages[perma] = id
+                else:
+                    content += f"# ::: {full_name}\n\n"
                 log.info(f"Generating symbol page {perma}: {full_name} ({id})")
             else:
-                content += self._generate_list(f"Namespace {full_name}", self.index.lookup_children(id))
+                content += self._generate_list(f"Namespace {full_name}", buckets.children.get(id, []))
 
             files.append(File.generated(config, f"{perma}", content=content))
             add_nav(perma, f'<code class="cxx-label-{type}">{type.replace("-", " ")}</code> {escape(full_name)}')
@@ -315,6 +504,7 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
             if not attach(config.nav):
                 log.error(f'Failed to attach generated nav to {self.config.path_prefix}index.md: not found')
 
+        self._stop_phase('index')
         return files
     
     @staticmethod
@@ -332,10 +522,60 @@ class CxxDoxPlugin(mkdocs.plugins.BasePlugin[CxxDoxConfig]):
 
         return str(rel_path)
     
+    def _direct_markdown(self, config: MkDocsConfig) -> Markdown:
+        # The site's extensions for the briefs and details of directly rendered
+        # pages, with symbol links resolved to page URLs as they skip the mkdocs link pass
+        extensions = [ext for ext in config.markdown_extensions if not isinstance(ext, CxxDoxExtension)]
+        extensions.append(CxxDoxExtension(self.index, self.url_resolver, self.source_html))
+        return Markdown(extensions=extensions, extension_configs=config.mdx_configs)
+
+    def source_html(self, sym_id: str) -> str:
+        # Signatures link to page URLs, relative to the directory of the page's URL
+        page_dir = posixpath.dirname(self.current_url)
+        return self.signature_cache.render(self.index, sym_id, page_dir, self.url_resolver)
+
+    def _split_permalink(self, abs_path: str) -> Tuple[str, str]:
+        parts = self.permalink_parts.get(abs_path)
+        if parts is None:
+            path, hash, fragment = abs_path.partition('#')
+            dir, file = posixpath.split(path)
+            parts = self.permalink_parts[abs_path] = (dir, file + hash + fragment)
+        return parts
+
+    def _relative_link(self, start: str, abs_path: str) -> str:
+        dir, tail = self._split_permalink(abs_path)
+        rel_dir = self.relative_dirs.get((start, dir))
+        if rel_dir is None:
+            rel_dir = os.path.relpath(dir or '.', start=start).replace('\\', '/')
+            self.relative_dirs[(start, dir)] = rel_dir
+        if rel_dir == '.':
+            return tail
+        return f"{rel_dir}/{tail}"
+
     def link_resolver(self, abs_path: str) -> str:
         if '*' in abs_path:
             abs_path = abs_path.replace('*', self.config.path_prefix)
         if self.current_uri is not None:
-            result = os.path.relpath(abs_path, start=os.path.dirname(self.current_uri)).replace('\\', '/')
+            start = posixpath.dirname(self.current_uri)
+            result = self.relative_links.get((start, abs_path))
+            if result is None:
+                result = self.relative_links[(start, abs_path)] = self._relative_link(start, abs_path)
             return result
         return abs_path
+
+    def url_resolver(self, abs_path: str) -> str:
+        # Used for HTML that bypasses Markdown elements (directly rendered pages,
+        # stashed signatures). mkdocs only turns links to .md files into page URLs
+        # inside elements, so resolve to URLs here
+        if '*' in abs_path:
+            abs_path = abs_path.replace('*', self.config.path_prefix)
+        result = self.relative_urls.get((self.current_url, abs_path))
+        if result is None:
+            path, hash, fragment = abs_path.partition('#')
+            file = self.files.get_file_from_path(path) if self.files is not None else None
+            if file is None:
+                result = self.link_resolver(abs_path)
+            else:
+                result = get_relative_url(file.url, self.current_url) + hash + fragment
+            self.relative_urls[(self.current_url, abs_path)] = result
+        return result
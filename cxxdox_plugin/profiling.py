@@ -0,0 +1,42 @@
+import cProfile
+import os
+
+class PhaseProfiler:
+    """cProfile profiles per build phase, written as `<phase>.prof` pstats files.
+
+    A phase can be started and stopped repeatedly (once per page for rendering),
+    its profile accumulates. Profiling is off while `directory` is None.
+    """
+    directory: str|None
+    profiles: dict[str, cProfile.Profile]
+
+    def __init__(self):
+        self.directory = None
+        self.profiles = {}
+
+    def reset(self, directory: str|None) -> None:
+        self.directory = directory
+        self.profiles = {}
+
+    def start(self, phase: str) -> None:
+        if self.directory is None:
+            return
+        profile = self.profiles.get(phase)
+        if profile is None:
+            profile = self.profiles[phase] = cProfile.Profile()
+        profile.enable()
+
+    def stop(self, phase: str) -> None:
+        if profile := self.profiles.get(phase):
+            profile.disable()
+
+    def write(self) -> list[str]:
+        if self.directory is None:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for phase, profile in self.profiles.items():
+            path = os.path.join(self.directory, f'{phase}.prof')
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
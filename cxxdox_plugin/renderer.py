@@ -0,0 +1,118 @@
+from typing import Callable
+from xml.etree.ElementTree import Element
+from markdown import Markdown
+from cxxdox_plugin.doxygen import doxygen_to_html, escape
+from .extension import parse_fragment
+from .index import Index
+from .tracing import tracer
+
+class SymbolPageRenderer:
+    """Renders generated symbol pages straight to HTML.
+
+    Produces the same markup as `CxxDoxProcessor` but without going through
+    Markdown: the page is rendered from the symbol id, so there is no block
+    parsing, no regex tests and no name lookup. Headings are collected as
+    toc tokens so the caller can rebuild the page table of contents. Briefs
+    and details still run through the tree processors of `md`, the site's
+    Markdown extensions, for inline markup, symbol links and highlighting.
+    """
+    index: Index
+    link_resolver: Callable[[str],str]
+    source_html: Callable[[str],str]
+    permalink: str # Mirrors the `toc` extension's permalink option, empty to disable
+    permalink_class: str
+    permalink_title: str
+    md: Markdown|None
+
+    def __init__(self, index: Index, link_resolver: Callable[[str],str], source_html: Callable[[str],str]):
+        self.index = index
+        self.link_resolver = link_resolver
+        self.source_html = source_html
+        self.permalink = ''
+        self.permalink_class = 'headerlink'
+        self.permalink_title = 'Permanent link'
+        self.md = None
+
+    def render(self, sym_id: str) -> tuple[str, list[dict]]:
+        html_parts: list[str] = []
+        headings: list[dict] = []
+        with tracer.span('symbol doc', 'render', id=sym_id):
+            self._symbol_doc(html_parts, headings, sym_id, 1)
+        return ''.join(html_parts), self._nest_headings(headings)
+
+    def _markdown(self, html: str) -> str:
+        # As Markdown.convert after block parsing, with the fragment as the only block
+        md = self.md
+        if md is None:
+            return html
+        root_el = Element(md.doc_tag)
+        root_el.append(parse_fragment(md, html))
+        for treeprocessor in md.treeprocessors:
+            new_root_el = treeprocessor.run(root_el)
+            if new_root_el is not None:
+                root_el = new_root_el
+        output = md.serializer(root_el)
+        output = output[output.index(f'<{md.doc_tag}>') + len(md.doc_tag) + 2:output.rindex(f'</{md.doc_tag}>')]
+        for postprocessor in md.postprocessors:
+            output = postprocessor.run(output)
+        md.reset()
+        return output.strip()
+
+    @staticmethod
+    def _nest_headings(headings: list[dict]) -> list[dict]:
+        toc: list[dict] = []
+        stack: list[dict] = []
+        for heading in headings:
+            while stack and stack[-1]['level'] >= heading['level']:
+                stack.pop()
+            (stack[-1]['children'] if stack else toc).append(heading)
+            stack.append(heading)
+        return toc
+
+    def _symbol_doc(self, html_parts: list[str], headings: list[dict], sym_id: str, heading_level: int, parent_group: str = '') -> None:
+        sym: dict = self.index[sym_id]
+        full_name = sym.get('full_name', '')
+
+        context = full_name or ''
+
+        link = self.index.symbol_permalink(sym_id)
+        hash = ''
+        if link is not None and '#' in link:
+            hash = link.split('#')[-1]
+
+        level = max(heading_level, 1)
+        label = escape(sym.get('type', '')).replace('-', ' ')
+        name = escape(sym.get('name', ''))
+        html_parts.append(f'<h{level} id="{escape(hash)}"><code class="cxx-label-{escape(sym.get("type", "unknown"))}">{label}</code> {name} ')
+
+        group = sym.get('group', '')
+        if group != '' and group != parent_group:
+            group_link = escape(self.link_resolver(f'*groups/{group}.md'))
+            html_parts.append(f'<a class="cxx-group" data-search-exclude="true" href="{group_link}" title="Group: {escape(group)}">{escape(group)}</a>')
+        if self.permalink:
+            html_parts.append(f'<a class="{escape(self.permalink_class)}" href="#{escape(hash)}" title="{escape(self.permalink_title)}">{self.permalink}</a>')
+        html_parts.append(f'</h{level}>')
+        headings.append({'level': level, 'id': hash, 'name': f'{label} {name}', 'children': []})
+
+        if 'source' in sym and sym['source']:
+            html_source = self.source_html(sym_id)
+            html_parts.append(f'<div class="highlight"><pre><code>{html_source}</code></pre></div>')
+
+        html_parts.append('<div class="cxx-contents">')
+        html_parts.append(self._markdown('<p>' + doxygen_to_html(sym.get('brief', ''), self.index, context, self.link_resolver) + '</p>'))
+        if 'details' in sym and sym['details']:
+            html_parts.append(self._markdown('<p>' + doxygen_to_html(sym.get('details', ''), self.index, context, self.link_resolver) + '</p>'))
+
+        children = self.index.lookup_children(sym_id)
+        if len(children) > 0:
+            html_parts.append('<div class="cxx-children">')
+            for child_id in children:
+                with tracer.span('symbol doc', 'render', id=child_id):
+                    self._symbol_doc(html_parts, headings, child_id, min(heading_level + 1, 6), group)
+            html_parts.append('</div>')
+
+        file = sym.get("file","")
+        if file != '':
+            location = f'Defined at {file}:{sym.get("line","")}'
+            html_parts.append(f'<div class="cxx-location"><p>{escape(location)}</p></div>')
+        html_parts.append('</div>')
@@ -0,0 +1,109 @@
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from time import perf_counter
+import heapq
+import sys
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+TOP_ITEMS = 5
+
+@dataclass
+class Phase:
+    total: float = 0.0
+    calls: int = 0
+    slowest: list[tuple[float, str]] = field(default_factory=list) # min-heap of the TOP_ITEMS slowest
+
+    def add(self, elapsed: float, item: str|None) -> None:
+        self.total += elapsed
+        self.calls += 1
+        if item is not None:
+            if len(self.slowest) < TOP_ITEMS:
+                heapq.heappush(self.slowest, (elapsed, item))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, item))
+
+class _Timer:
+    __slots__ = ('timings', 'phase', 'item', 'start')
+
+    def __init__(self, timings: 'Timings', phase: str, item: str|None):
+        self.timings = timings
+        self.phase = phase
+        self.item = item
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.timings.add(self.phase, perf_counter() - self.start, self.item)
+
+def peak_rss() -> int|None:
+    """Peak resident set size of this process in bytes, None where unsupported."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+_disabled = nullcontext()
+
+class Timings:
+    """Wall time per build phase.
+
+    Phases nest (the AST walk includes tokenization and Doxygen parsing), so
+    totals are not meant to add up. Collection is off unless `enabled` is set.
+    """
+    enabled: bool
+    phases: dict[str, Phase]
+    largest: dict[str, list[tuple[int, str]]]
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = {}
+        self.largest = {}
+
+    def reset(self) -> None:
+        self.phases = {}
+        self.largest = {}
+
+    def measure(self, phase: str, item: str|None = None):
+        if not self.enabled:
+            return _disabled
+        return _Timer(self, phase, item)
+
+    def add(self, phase: str, elapsed: float, item: str|None = None) -> None:
+        if not self.enabled:
+            return
+        p = self.phases.get(phase)
+        if p is None:
+            p = self.phases[phase] = Phase()
+        p.add(elapsed, item)
+
+    def add_size(self, name: str, size: int, item: str) -> None:
+        if not self.enabled:
+            return
+        sizes = self.largest.setdefault(name, [])
+        if len(sizes) < TOP_ITEMS:
+            heapq.heappush(sizes, (size, item))
+        elif size > sizes[0][0]:
+            heapq.heapreplace(sizes, (size, item))
+
+    def report(self) -> str:
+        width = max([len(name) for name in self.phases] + [5])
+        lines = [f"{'Phase':<{width}}  {'Calls':>8}  {'Total, s':>9}  {'Mean, ms':>9}",
+                 '-' * (width + 32)]
+        for name, p in self.phases.items():
+            lines.append(f"{name:<{width}}  {p.calls:>8}  {p.total:>9.3f}  {p.total * 1000 / p.calls:>9.3f}")
+        for name, p in self.phases.items():
+            if p.slowest:
+                lines.append(f"Slowest {name}:")
+                for elapsed, item in sorted(p.slowest, reverse=True):
+                    lines.append(f"  {elapsed:9.3f} s  {item}")
+        for name, sizes in self.largest.items():
+            lines.append(f"Largest {name}:")
+            for size, item in sorted(sizes, reverse=True):
+                lines.append(f"  {size:9} B  {item}")
+        return '\n'.join(lines)
+
+timings = Timings()
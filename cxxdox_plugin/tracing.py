@@ -0,0 +1,73 @@
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Any, TextIO
+import json
+import os
+import threading
+
+SUBTREE_MIN_CURSORS = 100 # Smaller AST subtrees are not traced individually
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, cat: str, args: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.tracer.add(self.name, self.cat, self.start, perf_counter(), **self.args)
+
+_disabled = nullcontext()
+
+class Tracer:
+    """Records spans as Chrome trace events.
+
+    The output opens in `chrome://tracing` or Perfetto. Every span carries the
+    process and thread it ran on, so work done by worker threads shows up as
+    separate tracks. Recording is off unless `enabled` is set.
+    """
+    enabled: bool
+    events: list[dict]
+    threads: dict[tuple[int, int], str]
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.threads = {}
+
+    def reset(self) -> None:
+        self.events = []
+        self.threads = {}
+
+    def span(self, name: str, cat: str, **args: Any):
+        if not self.enabled:
+            return _disabled
+        return _Span(self, name, cat, args)
+
+    def add(self, name: str, cat: str, start: float, end: float|None = None, **args: Any) -> None:
+        """Records a span between two `perf_counter()` readings, `end` defaults to now."""
+        if not self.enabled:
+            return
+        if end is None:
+            end = perf_counter()
+        pid = os.getpid()
+        tid = threading.get_ident()
+        if (pid, tid) not in self.threads:
+            self.threads[(pid, tid)] = threading.current_thread().name
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                 'pid': pid, 'tid': tid}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def write(self, f: TextIO) -> None:
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                    for (pid, tid), name in self.threads.items()]
+        json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f)
+
+tracer = Tracer()
@@ -0,0 +1,21 @@
+import pytest
+
+@pytest.fixture
+def libclang():
+    """Skips tests that parse C++ when the bundled libclang can't be loaded."""
+    from cxxdox_plugin.libclang21.cindex import conf, LibclangError
+    try:
+        conf.lib
+    except LibclangError as e:
+        pytest.skip(f'libclang is not available: {e}')
+
+@pytest.fixture
+def parser_state(libclang):
+    """Clears the parser's class-level caches, which otherwise survive between tests."""
+    from cxxdox_plugin.parser import Parser
+    Parser.units.clear()
+    Parser.source_cache.clear()
+    yield
+    Parser.units.clear()
+    Parser.source_cache.clear()
+    Parser.per_group_doc.clear()
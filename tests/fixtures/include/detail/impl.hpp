@@ -0,0 +1,7 @@
+#pragma once
+namespace lib {
+/// Excluded by file pattern
+struct Impl {
+    int value;
+};
+} // namespace lib
@@ -0,0 +1,7 @@
+#pragma once
+/// @addtogroup extras Extra functions
+
+namespace lib {
+/// In the file's group
+void extra();
+} // namespace lib
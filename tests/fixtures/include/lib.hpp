@@ -0,0 +1,42 @@
+#pragma once
+#include "detail/impl.hpp"
+#include "extra.hpp"
+
+namespace lib {
+
+/// @brief Arithmetic helpers
+/// @ingroup math
+struct Calc {
+    /// Adds two numbers
+    int add(int a, int b);
+
+    /// Nested type, in the group of its scope
+    struct Inner {
+        int value;
+    };
+
+    /// In a group of its own
+    /// @ingroup util
+    int scale;
+
+protected:
+    int base;
+
+private:
+    int secret;
+    void hidden();
+};
+
+/// Formats a value
+/// @ingroup util
+void format(int value);
+
+/// Not grouped
+void plain();
+
+namespace internal {
+/// Excluded by symbol pattern
+void detail_function();
+}
+
+} // namespace lib
@@ -0,0 +1,47 @@
+import json
+import os
+from cxxdox_plugin.dependencies import IncludeGraph
+
+def write(file_name, text=''):
+    with open(file_name, 'w') as f:
+        f.write(text)
+
+def make_graph(tmp_path):
+    # a.hpp -> b.hpp -> c.hpp, d.hpp -> e.hpp
+    names = {name: str(tmp_path / name) for name in ['a.hpp', 'b.hpp', 'c.hpp', 'd.hpp', 'e.hpp']}
+    for file_name in names.values():
+        write(file_name)
+    graph = IncludeGraph()
+    graph.record(names['a.hpp'], [(names['a.hpp'], names['b.hpp']), (names['b.hpp'], names['c.hpp'])])
+    graph.record(names['d.hpp'], [(names['d.hpp'], names['e.hpp'])])
+    return graph, names
+
+def test_invalidated_through_transitive_includes(tmp_path):
+    graph, names = make_graph(tmp_path)
+    assert graph.invalidated({names['c.hpp']}) == {names['a.hpp']}
+    assert graph.invalidated({names['b.hpp'], names['e.hpp']}) == {names['a.hpp'], names['d.hpp']}
+    assert graph.invalidated({names['d.hpp']}) == {names['d.hpp']}
+    assert graph.invalidated({str(tmp_path / 'other.hpp')}) == set()
+
+def test_changed_files(tmp_path):
+    graph, names = make_graph(tmp_path)
+    assert graph.changed_files() == set()
+
+    mtime = os.stat(names['c.hpp']).st_mtime_ns
+    os.utime(names['c.hpp'], ns=(mtime + 10**9, mtime + 10**9))
+    assert graph.changed_files() == {names['c.hpp']}
+    assert graph.invalidated(graph.changed_files()) == {names['a.hpp']}
+
+def test_removed_input(tmp_path):
+    graph, names = make_graph(tmp_path)
+    os.remove(names['d.hpp'])
+    assert graph.changed_files() == {names['d.hpp']}
+    assert graph.invalidated(graph.changed_files()) == {names['d.hpp']}
+
+def test_write(tmp_path):
+    graph, names = make_graph(tmp_path)
+    graph.write(str(tmp_path / 'graph.json'))
+    with open(tmp_path / 'graph.json', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['units'][names['a.hpp']]['includes'] == {names['a.hpp']: [names['b.hpp']], names['b.hpp']: [names['c.hpp']]}
+    assert set(data['units'][names['a.hpp']]['mtimes']) == {names['a.hpp'], names['b.hpp'], names['c.hpp']}
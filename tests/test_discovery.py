@@ -0,0 +1,68 @@
+import glob
+import os
+import re
+import pytest
+from cxxdox_plugin.discovery import find_files, translate_glob
+
+FILES = ['top.hpp', 'top.cpp', '.hidden.hpp', 'a/x.hpp', 'a/b/y.hpp', 'a/b/z.h', 'a/.hid/w.hpp', 'a/.v.hpp',
+         'third/t.hpp', 'third/deep/u.hpp', 'inc/k.hpp', 'inc/detail/d.hpp', 'd[1]/e.hpp']
+
+CASES = [
+    (['**/*.hpp'], []),
+    (['**/*.hpp'], ['third/**']),
+    (['**/*.hpp', '**/*.h'], ['**/detail/*', 'third/**/*']),
+    (['*.hpp'], []),
+    (['a/*/*.hpp'], ['a/b/y.hpp']),
+    (['**'], ['a/**']),
+    (['a/.*'], []),
+    (['top.hpp', 'a/x.hpp', 'missing.hpp'], []),
+    (['d[[]1]/*.hpp'], []),
+    (['[!a]*/*.hpp'], []),
+    (['**/*.[hc]pp'], ['**/b/*']),
+    (['inc/**/*.hpp'], ['**/detail/*']),
+    (['../root/a/**/*.hpp'], []),
+    (['a/link/*.hpp', '**/k.hpp'], []),
+]
+
+def glob_files(include_patterns, exclude_patterns, root_dir):
+    # What parse_glob used to do, keeping files only
+    files = set()
+    for pattern in include_patterns:
+        files.update(glob.glob(os.path.join(root_dir, pattern), recursive=True))
+    for pattern in exclude_patterns:
+        files.difference_update(glob.glob(os.path.join(root_dir, pattern), recursive=True))
+    return sorted(file for file in files if os.path.isfile(file))
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'root'
+    for name in FILES:
+        os.makedirs(root / os.path.dirname(name), exist_ok=True)
+        (root / name).write_text('')
+    try:
+        os.symlink(os.path.join('..', 'inc'), root / 'a' / 'link')
+    except OSError:
+        pass # No symlinks on this platform
+    return root
+
+@pytest.mark.parametrize('include_patterns, exclude_patterns', CASES)
+def test_find_files_matches_glob(tree, include_patterns, exclude_patterns, monkeypatch):
+    assert find_files(include_patterns, exclude_patterns, str(tree)) == glob_files(include_patterns, exclude_patterns, str(tree))
+
+    # Relative root directory
+    monkeypatch.chdir(tree.parent)
+    assert find_files(include_patterns, exclude_patterns, 'root') == glob_files(include_patterns, exclude_patterns, 'root')
+
+def test_translate_glob():
+    def matches(pattern, name):
+        return re.match(translate_glob(pattern), name) is not None
+
+    assert matches('*.hpp', 'a.hpp')
+    assert not matches('*.hpp', 'a/b.hpp')
+    assert not matches('*.hpp', '.a.hpp')
+    assert matches('.*.hpp', '.a.hpp')
+    assert matches('**/*.hpp', 'a.hpp') and matches('**/*.hpp', 'a/b/c.hpp')
+    assert not matches('**/*.hpp', '.a/c.hpp')
+    assert matches('[!a]?.h', 'bc.h') and not matches('[!a]?.h', 'ac.h')
+    assert matches('[]a].h', '].h')
+    assert matches('a[&~|[]b', 'a[b')
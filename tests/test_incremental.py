@@ -0,0 +1,74 @@
+import os
+from cxxdox_plugin.index import Index
+
+ARGS = ['-std=c++20']
+
+def write(file_name, text):
+    with open(file_name, 'w') as f:
+        f.write(text)
+    # Make sure the change is seen whatever the file system's timestamp resolution
+    mtime = os.stat(file_name).st_mtime_ns + 10**9
+    os.utime(file_name, ns=(mtime, mtime))
+
+def make_tree(tmp_path):
+    os.mkdir(tmp_path / 'detail')
+    write(tmp_path / 'detail' / 'common.hpp', '#pragma once\n/// Common\nstruct Common {};\n')
+    write(tmp_path / 'a.hpp', '#pragma once\n#include "detail/common.hpp"\n/// A\nstruct A {};\n')
+    write(tmp_path / 'b.hpp', '#pragma once\n#include "detail/common.hpp"\n/// B\nstruct B {};\n')
+
+def parse(tmp_path, args=ARGS):
+    # As CxxDoxPlugin does on every build with `incremental: true`
+    from cxxdox_plugin.parser import Parser
+    Parser.invalidate_units()
+    index = Index()
+    parser = Parser(index, clang_args=args, incremental=True)
+    parser.parse_glob(['*.hpp'], [], str(tmp_path))
+    reused = [(os.path.basename(stats.file), stats.reused) for stats in parser.stats]
+    return index, reused
+
+def names(index):
+    return sorted(index[id]['name'] for id in index.all_symbols())
+
+def test_unchanged_units_are_reused(tmp_path, parser_state):
+    make_tree(tmp_path)
+    index, reused = parse(tmp_path)
+    assert reused == [('a.hpp', False), ('b.hpp', False)]
+    assert names(index) == ['A', 'B', 'Common']
+
+    index, reused = parse(tmp_path)
+    assert reused == [('a.hpp', True), ('b.hpp', True)]
+    assert names(index) == ['A', 'B', 'Common']
+
+def test_change_invalidates_units_including_it(tmp_path, parser_state):
+    make_tree(tmp_path)
+    parse(tmp_path)
+
+    write(tmp_path / 'b.hpp', '#pragma once\n#include "detail/common.hpp"\n/// B\nstruct B2 {};\n')
+    index, reused = parse(tmp_path)
+    assert reused == [('a.hpp', True), ('b.hpp', False)]
+    assert names(index) == ['A', 'B2', 'Common']
+
+    # Included by both inputs, through detail/
+    write(tmp_path / 'detail' / 'common.hpp', '#pragma once\n/// Common\nstruct Common2 {};\n')
+    index, reused = parse(tmp_path)
+    assert reused == [('a.hpp', False), ('b.hpp', False)]
+    assert names(index) == ['A', 'B2', 'Common2']
+
+def test_removed_input(tmp_path, parser_state):
+    make_tree(tmp_path)
+    parse(tmp_path)
+
+    # b.hpp skipped common.hpp as indexed by a.hpp; with a.hpp gone its kept
+    # unit lacks Common and has to be parsed again
+    os.remove(tmp_path / 'a.hpp')
+    index, reused = parse(tmp_path)
+    assert reused == [('b.hpp', False)]
+    assert names(index) == ['B', 'Common']
+
+def test_options_change(tmp_path, parser_state):
+    make_tree(tmp_path)
+    parse(tmp_path)
+
+    index, reused = parse(tmp_path, ARGS + ['-DUNUSED=1'])
+    assert reused == [('a.hpp', False), ('b.hpp', False)]
+    assert names(index) == ['A', 'B', 'Common']
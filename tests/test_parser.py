@@ -0,0 +1,70 @@
+import os
+import pytest
+from cxxdox_plugin.index import Index
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# id -> (type, full name, parent, group, access)
+EXPECTED = {
+    'c:@N@lib': ('namespace', 'lib', None, None, None),
+    'c:@N@lib@N@internal': ('namespace', 'lib::internal', 'c:@N@lib', None, None),
+    'c:@N@lib@S@Calc': ('struct', 'lib::Calc', 'c:@N@lib', 'math', None),
+    'c:@N@lib@S@Calc@F@add#I#I#': ('function', 'lib::Calc::add(int, int)', 'c:@N@lib@S@Calc', 'math', 'public'),
+    'c:@N@lib@S@Calc@S@Inner': ('struct', 'lib::Calc::Inner', 'c:@N@lib@S@Calc', 'math', 'public'),
+    'c:@N@lib@S@Calc@S@Inner@FI@value': ('variable', 'lib::Calc::Inner::value', 'c:@N@lib@S@Calc@S@Inner', 'math', 'public'),
+    'c:@N@lib@S@Calc@FI@scale': ('variable', 'lib::Calc::scale', 'c:@N@lib@S@Calc', 'util', 'public'),
+    'c:@N@lib@S@Calc@FI@base': ('variable', 'lib::Calc::base', 'c:@N@lib@S@Calc', 'math', 'protected'),
+    'c:@N@lib@F@format#I#': ('function', 'lib::format(int)', 'c:@N@lib', 'util', None),
+    'c:@N@lib@F@plain#': ('function', 'lib::plain()', 'c:@N@lib', None, None),
+    'c:@N@lib@F@extra#': ('function', 'lib::extra()', 'c:@N@lib', 'extras', None),
+}
+
+def parse(threads=1, umbrella=False, include_patterns=['include/*.hpp'], root_dir=FIXTURES):
+    from cxxdox_plugin.parser import Parser
+    index = Index()
+    parser = Parser(index, clang_args=['-std=c++20'], ignored_file_patterns=['*/detail/*'],
+                    ignored_symbol_patterns=['*::internal::*'], threads=threads)
+    parser.parse_glob(include_patterns, ['*/detail/*'], root_dir, umbrella)
+    return index, parser
+
+def symbol_table(index):
+    return {id: (index[id]['type'], index[id]['full_name'], index[id]['parent'],
+                 index[id].get('group'), index[id].get('access')) for id in index.all_symbols()}
+
+@pytest.mark.parametrize('threads, umbrella', [(1, False), (2, False), (1, True)])
+def test_symbols(threads, umbrella, parser_state):
+    index, _ = parse(threads, umbrella)
+    symbols = symbol_table(index)
+    # Private members, lib::Impl from the excluded detail/ directory and
+    # lib::internal::detail_function are left out
+    assert symbols == EXPECTED
+
+    calc = index['c:@N@lib@S@Calc']
+    assert (calc['file'], calc['line'], calc['brief']) == ('lib.hpp', 9, 'Arithmetic helpers')
+    extra = index['c:@N@lib@F@extra#']
+    assert (extra['file'], extra['line'], extra['brief']) == ('extra.hpp', 6, "In the file's group")
+    assert index.lookup_children('c:@N@lib@S@Calc') == ['c:@N@lib@S@Calc@F@add#I#I#', 'c:@N@lib@S@Calc@S@Inner',
+                                                         'c:@N@lib@S@Calc@FI@scale', 'c:@N@lib@S@Calc@FI@base']
+
+def test_inputs_outside_root(parser_state):
+    # Inputs matched through '..' are walked, and so are the headers next to them
+    index, _ = parse(include_patterns=['../*.hpp'], root_dir=os.path.join(FIXTURES, 'include', 'detail'))
+    assert symbol_table(index) == EXPECTED
+
+def test_headers_indexed_once(parser_state):
+    _, parser = parse()
+    # extra.hpp sorts first, lib.hpp then skips it
+    assert [(os.path.basename(stats.file), stats.files_skipped) for stats in parser.stats] == [('extra.hpp', 0), ('lib.hpp', 1)]
+
+def test_walk_errors_propagate(parser_state, monkeypatch):
+    from cxxdox_plugin.parser import Parser
+    parse_cursor = Parser._parse_cursor
+
+    def failing_parse_cursor(self, info, path, parent_id):
+        if info.spelling == 'plain':
+            raise ValueError('walk failed')
+        return parse_cursor(self, info, path, parent_id)
+
+    monkeypatch.setattr(Parser, '_parse_cursor', failing_parse_cursor)
+    with pytest.raises(ValueError, match='walk failed'):
+        parse()